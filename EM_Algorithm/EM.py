@@ -6,25 +6,95 @@ rcParams.update({'font.size': 18})
 # import matplotlib
 # matplotlib.use('Agg')
 from basic.binning import binning, scatter_hist
-from basic.math_fn import to_1darray, oneD_gaussian, ln_oneD_gaussian, exp_survival, ln_exp_pdf, ln_gau_exp_pdf, exp_gauss_2d
+from basic.math_fn import to_1darray, oneD_gaussian, ln_oneD_gaussian, exp_survival, ln_exp_pdf, ln_exp_pdf_censored, ln_gau_exp_pdf, exp_gauss_2d
 
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
 
-from sklearn.cluster import KMeans
 from sklearn.mixture import GaussianMixture
 from basic.file_io import save_img
 from lifelines import KaplanMeierFitter
 import pandas as pd
-import random
-
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, wraps
+import inspect
+from scipy.special import logsumexp
+from EM_Algorithm.initialization import init_gauss, init_exp_moments, init_random
+from EM_Algorithm.cache import FitCache
+from EM_Algorithm.convergence import rel_change_LLE, rel_change_para, check_convergence, get_reason
+
+
+###  process-pool workers for EM.opt_components, each process keeps one EM of the data
+_EM_worker = None
+
+def _init_EM_worker(data, weights):
+    global _EM_worker
+    _EM_worker = EM(data, dim=data.shape[1], dtype=data.dtype, weights=weights)
+
+def _fit_candidate_worker(args):
+    return _EM_worker.fit_candidate(*args)
+
+def _fit_bootstrap_worker(args):
+    return _EM_worker.fit_bootstrap(*args)
+
+##  worker of a pool shared by fits of different data (no initializer), data and weights are sent with each task
+def _fit_candidate_data_worker(args):
+    data, weights, task = args
+    return EM(data, dim=data.shape[1], dtype=data.dtype, weights=weights).fit_candidate(*task)
+
+##  unique values of data and their counts, use as EM(values, dim, weights=counts) for repeated values
+def unique_counts(data, dim=1):
+    values, counts = np.unique(np.asarray(data).reshape(-1, dim), axis=0, return_counts=True)
+    return values, counts
+
+###  attributes set by a fit and restored from FitCache
+_cached_attributes = ['mode', 'n_components', 'tolerance', 'censored', 'para_progress', 'para_final',
+                      'ln_likelihood', 'ln_likelihood_samples', 'ln_likelihood_progress', 'SE', 'converged',
+                      'n_iter', 'n_eval', 'converged_reason', 'f_i', 'm_i', 's_i']
+
+##  decorator of fit methods: load results from self.cache if the same fit of the same data was done, else fit and save
+##  key includes the state of self.rng before the fit (random initialization and reset of small s draw from it),
+##  the state after the fit is restored on a hit, so restarts on one EM give the same results as without cache
+##  fits are cached only if EM has a seed
+def cached_fit(fit):
+    signature = inspect.signature(fit)
+    @wraps(fit)
+    def fit_cached(self, *args, **kwargs):
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        para = dict(arguments.arguments)
+        del para['self']
+        if self.cache is None or self.seed is None:
+            return fit(self, *args, **kwargs)
+        key = self.cache.get_key(self.data, self.weights, fit=fit.__name__, rng_state=self.rng.bit_generator.state,
+                                 s_lower=self.s_lower, **para)
+        entry = self.cache.load(key)
+        if entry is None:
+            results = fit(self, *args, **kwargs)
+            entry = {'results': results, **self.get_criteria(), 'rng_state': self.rng.bit_generator.state,
+                     'attributes': {name: getattr(self, name) for name in _cached_attributes if hasattr(self, name)}}
+            self.cache.save(key, entry)
+        else:
+            self.__dict__.update(entry['attributes'])
+            self.rng.bit_generator.state = entry['rng_state']
+        return entry['results']
+    return fit_cached
 
 ### data: (n,1)-array
 class EM:
-    def __init__(self, data, dim=1):
-        self.data = data.reshape(-1, dim)
+    ##  weights: (n,)-array of counts of each sample, e.g. from unique_counts(data); None: each sample counts 1
+    ##  seed: seed of self.rng, used by random and k-means++ initialization
+    ##  cache: FitCache or its folder, GMM, PEM, GPEM and GPEM_set results are saved and reused for the same data and seed
+    def __init__(self, data, dim=1, dtype=np.float64, weights=None, seed=None, cache=None):
+        self.data = np.asarray(data, dtype=dtype).reshape(-1, dim) ## float32 halves memory for large data
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+        self.n_samples = len(self.data) if weights is None else np.sum(self.weights)
+        self.censored = None
         self.s_lower = 1
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.cache = FitCache(cache) if isinstance(cache, str) else cache
 
     def skGMM(self, n_components, tolerance=10e-5):
         self.n_components = n_components
@@ -43,214 +113,355 @@ class EM:
         return f, m, s, labels, data_cluster
 
 
-    def GMM(self, n_components, tolerance=1e-2, rand_init=False):
+    @cached_fit
+    def GMM(self, n_components, tolerance=1e-2, rand_init=False, para_init=None, return_SE=False, init='kmeans',
+            tol_LLE=1e-6, min_iter=20, max_iter=500, accelerate=False):
         """EM algorithm with pdf=Gaussian (GMM)
         Parameters
         ----------
         n_components : int
             Number of components.
         tolerance : float
-            Convergence criteria
+            Convergence criteria, relative change of parameters
+        tol_LLE : float
+            Convergence criteria, relative change of log-likelihood
+        min_iter, max_iter : int
+            number of iterations is between min_iter and max_iter, saved in self.n_iter
+        accelerate : bool
+            SQUAREM extrapolation, each iteration uses 3 EM steps, number of E-steps is saved in self.n_eval
+        para_init : list of array, [f, m, s]
+            initial parameters, e.g. from OnlineEM; rand_init is ignored if given
+        init : str
+            'kmeans' (deterministic, seeded by quantiles), 'kmeans++' (seeded by self.rng) or 'quantile';
+            rand_init=True uses random parameters from self.rng
+        return_SE : bool
+            compute and return standard errors [SE_f, SE_m, SE_s], also saved in self.SE; False: self.SE is None
         data : array (n_samples,1)
         Returns
         -------
 
         """
-        ## (f,m,s) are growing array
+        ## (f,m,s) are (n_components,) arrays of current iteration, saved in preallocated para_progress
         data = self.data
+        self.mode = 'GMM'
         self.n_components = n_components
         self.tolerance = tolerance
         ##  initialize EM parameters
-        f, m, s, loop, improvement = self.__init_GMM(data, n_components=n_components, rand_init=rand_init)
-        converged = improvement < tolerance
-        while (loop < 20 or ~converged) and loop < 500:
+        if para_init is None:
+            f, m, s = self.__init_GMM(data, n_components=n_components, rand_init=rand_init, init=init)
+        else:
+            f, m, s = self.__init_given(para_init)
+        def step(f, m, s):
             prior_prob = self.__weighting(f, m, s, function=ln_oneD_gaussian)
-            f, m, s = self.__update_f_m_s(data, prior_prob, f, m, s)
-            improvement = self.__cal_improvement(f, m, s)
-            converged = improvement < tolerance
-            loop += 1
-        f, m, s = self.__reshape_all(f, m, s, n_rows=loop+1, n_cols=n_components)
+            return self.__update_f_m_s(data, prior_prob)
+        para_progress, loop, converged = self.__iterate(step, [f, m, s], n_track=3, tolerance=tolerance,
+                                                        tol_LLE=tol_LLE, min_iter=min_iter, max_iter=max_iter,
+                                                        accelerate=accelerate)
+        f, m, s = [para[:loop+1] for para in para_progress]
         self.para_progress = [f, m, s]
         m_f, f_f, s_f = self.__sort_according(m[-1], f[-1], s[-1])
         self.para_final = [f_f, m_f, s_f]
         para = self.para_final
         self.__cal_LLE(data, function=ln_oneD_gaussian, para=para)
+        self.SE = self.__cal_SE_GMM(data, para) if return_SE else None
         converged = np.array([converged] * n_components)
         self.converged = converged
         # labels, data_cluster = self.predict(data, ln_oneD_gaussian, paras=[f.ravel(), m.ravel(), s.ravel()])
+        if return_SE:
+            return f_f, m_f, s_f, converged, self.SE
         return f_f, m_f, s_f, converged
 
-    def PEM(self, n_components, tolerance=1e-2, rand_init=False):
+    ##  censored: (n,) bool array, True for right-censored dwell time (trace ends before the dwell ends)
+    ##  standard errors of [f, tau] are computed only if return_SE, saved in self.SE (None otherwise)
+    ##  convergence criteria (tolerance, tol_LLE, min_iter, max_iter) and accelerate are the same as GMM
+    ##  init: 'moments' (log-spaced tau matching mean and variance of data) or 'linspace' (tau in mean +- std/2)
+    @cached_fit
+    def PEM(self, n_components, tolerance=1e-2, rand_init=False, para_init=None, censored=None, return_SE=False, init='moments',
+            tol_LLE=1e-6, min_iter=20, max_iter=500, accelerate=False):
         data = self.data
+        self.mode = 'PEM'
         self.n_components = n_components
         self.tolerance = tolerance
-        f, tau, s, loop, improvement = self.__init_PEM(data, n_components=n_components, rand_init=rand_init)
-        converged = improvement < tolerance
-        while (loop < 20 or ~converged) and loop < 500:
-            prior_prob = self.__weighting(f, tau, function=ln_exp_pdf)
-            f, tau, s = self.__update_f_m_s(data, prior_prob, f, tau, s)
-            improvement = self.__cal_improvement(f, tau)
-            converged = improvement < tolerance
-            loop += 1
-        f, tau, s = self.__reshape_all(f, tau, s, n_rows=loop+1, n_cols=n_components)
+        self.censored = None if censored is None else np.asarray(censored, dtype=bool).ravel()
+        function = self.__get_PEM_function()
+        if para_init is None:
+            f, tau, s = self.__init_PEM(data, n_components=n_components, rand_init=rand_init, init=init)
+        else: ## [f, tau]
+            f, tau = self.__init_given(para_init)
+            s = tau.copy()
+        def step(f, tau, s):
+            prior_prob = self.__weighting(f, tau, function=function)
+            f, tau, s = self.__update_f_m_s(data, prior_prob)
+            if self.censored is not None:
+                tau = self.__update_tau_censored(data, prior_prob)
+            return f, tau, s
+        ##  s is recorded but not used for convergence
+        para_progress, loop, converged = self.__iterate(step, [f, tau, s], n_track=2, tolerance=tolerance,
+                                                        tol_LLE=tol_LLE, min_iter=min_iter, max_iter=max_iter,
+                                                        accelerate=accelerate)
+        f, tau, s = [para[:loop+1] for para in para_progress]
         self.para_progress = [f, tau, s]
         tau_f, f_f, s_f = self.__sort_according(tau[-1], f[-1], s[-1])
         self.para_final = [f_f, tau_f]
         para = self.para_final
-        ln_likelihood = self.__cal_LLE(data, function=ln_exp_pdf, para=para)
+        ln_likelihood = self.__cal_LLE(data, function=function, para=para)
+        self.SE = self.__cal_SE_PEM(data, para) if return_SE else None
         converged = np.array([converged] * n_components)
         self.converged = converged
         # labels, data_cluster = self.predict(data, ln_exp_pdf, paras=[f.ravel(), tau.ravel()])
+        if return_SE:
+            return f_f, tau_f, s_f, converged, ln_likelihood, self.SE
         return f_f, tau_f, s_f, converged, ln_likelihood
 
-    def GPEM(self, n_components, tolerance=1e-2, rand_init=False):
+    ##  standard errors of [f, m, s, tau] are computed only if return_SE, saved in self.SE (None otherwise)
+    @cached_fit
+    def GPEM(self, n_components, tolerance=1e-2, rand_init=False, para_init=None, return_SE=False, init='kmeans',
+             tol_LLE=1e-6, min_iter=20, max_iter=500, accelerate=False):
         data = self.data ## (n_samples, 2)
         x = data[:, 0] ## Gaussian R.V.
         y = data[:, 1] ## Poisson R.V.
+        self.mode = 'GPEM'
         self.tolerance = tolerance
         ##  initialize EM parameters
-        f1, m, s1, loop, improvement = self.__init_GMM(data[:,0], n_components=n_components, rand_init=rand_init)
-        f2, tau, s2, loop, improvement = self.__init_PEM(data[:,1], n_components=n_components, rand_init=rand_init)
-        converged = improvement < tolerance
-        while (loop < 20 or ~converged) and loop < 500:
+        if para_init is None:
+            f1, m, s1 = self.__init_GMM(data[:,0], n_components=n_components, rand_init=rand_init, init=init)
+            f2, tau, s2 = self.__init_PEM(data[:,1], n_components=n_components, rand_init=rand_init)
+        else: ## [f, m, s, tau]
+            f1, m, s1, tau = self.__init_given(para_init)
+        def step(f1, m, s1, tau):
             prior_prob = self.__weighting(f1, m, s1, tau, function=ln_gau_exp_pdf)
-            f1, m, s1 = self.__update_f_m_s(data[:,0].reshape(-1,1), prior_prob, f1, m, s1)
-            f2, tau, s2 = self.__update_f_m_s(data[:,1].reshape(-1,1), prior_prob, f2, tau, s2)
-            improvement = self.__cal_improvement(f1, m, s1, tau)
-            converged = improvement < tolerance
-            loop += 1
-        f1, m, s1, tau = self.__reshape_all(f1, m, s1, tau, n_rows=loop+1, n_cols=n_components)
+            f1, m, s1 = self.__update_f_m_s(data[:,0].reshape(-1,1), prior_prob)
+            f2, tau, s2 = self.__update_f_m_s(data[:,1].reshape(-1,1), prior_prob)
+            return f1, m, s1, tau
+        para_progress, loop, converged = self.__iterate(step, [f1, m, s1, tau], n_track=4, tolerance=tolerance,
+                                                        tol_LLE=tol_LLE, min_iter=min_iter, max_iter=max_iter,
+                                                        accelerate=accelerate)
+        f1, m, s1, tau = [para[:loop+1] for para in para_progress]
         self.para_progress = [f1, m, s1, tau]
         m_f, f_f, s_f, tau_f = self.__sort_according(m[-1], f1[-1], s1[-1], tau[-1])
         self.para_final = [f_f, m_f, s_f, tau_f]
         para = self.para_final
         ln_likelihood = self.__cal_LLE(data, function=ln_gau_exp_pdf, para=para)
+        self.SE = self.__cal_SE_GPEM(data, para) if return_SE else None
         converged = np.array([converged] * n_components)
         self.converged = converged
         # labels, data_cluster = self.predict(data, function=ln_gau_exp_pdf, paras=para)
+        if return_SE:
+            return f_f, m_f, s_f, tau_f, converged, ln_likelihood, self.SE
         return f_f, m_f, s_f, tau_f, converged, ln_likelihood
 
     ## set given m
-    def GPEM_set(self, n_components, m_set, tolerance=1e-2, rand_init=False):
+    @cached_fit
+    def GPEM_set(self, n_components, m_set, tolerance=1e-2, rand_init=False, init='kmeans', tol_LLE=1e-6, min_iter=20, max_iter=500, accelerate=False):
         data = self.data ## (n_samples, 2)
         x = data[:, 0] ## Gaussian R.V.
         y = data[:, 1] ## Poisson R.V.
+        self.mode = 'GPEM'
         self.tolerance = tolerance
         ##  initialize EM parameters
-        m_fix = m_set.copy()
-        f1, m, s1, loop, improvement = self.__init_GMM(data[:,0], n_components=n_components, rand_init=rand_init)
-        f2, tau, s2, loop, improvement = self.__init_PEM(data[:,1], n_components=n_components, rand_init=rand_init)
-        converged = improvement < tolerance
-        while (loop < 20 or ~converged) and loop < 500:
+        m_fix = np.array(m_set, dtype=float)
+        f1, m, s1 = self.__init_GMM(data[:,0], n_components=n_components, rand_init=rand_init, init=init)
+        f2, tau, s2 = self.__init_PEM(data[:,1], n_components=n_components, rand_init=rand_init)
+        def step(f1, m_fix, s1, tau):
             prior_prob = self.__weighting(f1, m_fix, s1, tau, function=ln_gau_exp_pdf)
-            m_fix = np.append(m_fix, m_set)
-            f1, m1_notuse, s1 = self.__update_f_m_s(data[:,0].reshape(-1,1), prior_prob, f1, m_fix, s1)
-            f2, tau, s2 = self.__update_f_m_s(data[:,1].reshape(-1,1), prior_prob, f2, tau, s2)
-            improvement = self.__cal_improvement(f1, m_fix, s1, tau)
-            converged = improvement < tolerance
-            loop += 1
-        f1, m_fix, s1, tau = self.__reshape_all(f1, m_fix, s1, tau, n_rows=loop+1, n_cols=n_components)
+            f1, m1_notuse, s1 = self.__update_f_m_s(data[:,0].reshape(-1,1), prior_prob)
+            f2, tau, s2 = self.__update_f_m_s(data[:,1].reshape(-1,1), prior_prob)
+            return f1, m_fix, s1, tau
+        para_progress, loop, converged = self.__iterate(step, [f1, m_fix, s1, tau], n_track=4, tolerance=tolerance,
+                                                        tol_LLE=tol_LLE, min_iter=min_iter, max_iter=max_iter,
+                                                        accelerate=accelerate)
+        f1, m_fix, s1, tau = [para[:loop+1] for para in para_progress]
         self.para_progress = [f1, m_fix, s1, tau]
         m_fix_f, f_f, s_f, tau_f = self.__sort_according(m_fix[-1], f1[-1], s1[-1], tau[-1])
         self.para_final = [f_f, m_fix_f, s_f, tau_f]
         para = self.para_final
         ln_likelihood = self.__cal_LLE(data, function=ln_gau_exp_pdf, para=para)
+        self.SE = None
         converged = np.array([converged] * n_components)
         self.converged = converged
         # labels, data_cluster = self.predict(data, function=ln_gau_exp_pdf, paras=para)
         return f_f, m_fix_f, s_f, tau_f, converged, ln_likelihood
 
-    ##  iteratively find lowest BIC or AIC value
-    def opt_components_iter(self, iteration=10, tolerance=1e-2, mode='GMM', criteria='BIC', figure=False, figsize=(10, 10)):
-        n_all, c_all = [], []
-        for i in range(iteration):
-            n = self.opt_components(tolerance=tolerance, mode=mode, criteria=criteria, figure=figure, figsize=figsize)
-            if criteria == 'AIC':
-                c = self.AIC_owns[n - 1]
-            else:
-                c = self.BIC_owns[n - 1]
-            n_all = np.append(n_all, n)
-            c_all = np.append(c_all, c)
-        index = np.argmin(c_all)
-        return int(n_all[index])
-
-
-    def opt_components(self, tolerance=1e-2, mode='GMM', criteria='BIC', figure=False, figsize=(10,10)):
+    ##  iteratively find lowest BIC or AIC value, iterations are random restarts of the (n_components x restart) grid
+    def opt_components_iter(self, iteration=10, tolerance=1e-2, mode='GMM', criteria='BIC', figure=False, figsize=(10, 10),
+                            n_workers=1, seed=None, executor=None):
+        n = self.opt_components(tolerance=tolerance, mode=mode, criteria=criteria, figure=figure, figsize=figsize,
+                                n_restarts=iteration, n_workers=n_workers, seed=seed, executor=executor)
+        return n
+
+    ##  fit all (n_components x restart) tasks with random initialization, n_workers > 1: tasks run in a process pool
+    ##  executor: ProcessPoolExecutor opened once by the caller and reused for many fits, n_workers is then ignored
+    ##  results of all tasks are saved in self.opt_table, the best restart of each n_components is used for criteria
+    def opt_components(self, tolerance=1e-2, mode='GMM', criteria='BIC', figure=False, figsize=(10,10),
+                       n_restarts=1, n_workers=1, seed=None, executor=None):
         self.mode = mode
         ##  find best n_conponents
         data = self.data
-        BICs, AICs = [], []
-        BIC_owns, AIC_owns = [], []
-        LLE = []
         n_clusters = np.arange(1, 6)
-        for c in n_clusters:
-            if mode == 'GMM':
-                self.GMM(n_components=c, tolerance=tolerance, rand_init=True)
-                gmm = GaussianMixture(n_components=c, tol=tolerance).fit(data)
-                BICs += [gmm.bic(data)]
-                AICs += [gmm.aic(data)]
-            elif mode == 'PEM':
-                self.PEM(n_components=c, tolerance=tolerance, rand_init=True)
-            else:
-                self.GPEM(n_components=c, tolerance=tolerance, rand_init=True)
-
-            BIC_owns += [self.__BIC()]
-            AIC_owns += [self.__AIC()]
-            LLE += [self.ln_likelihood]
-
-        BIC_owns, AIC_owns = to_1darray(BIC_owns, AIC_owns)
+        ##  independent seed for each task
+        seeds = np.random.SeedSequence(seed).generate_state(len(n_clusters) * n_restarts)
+        args = [(mode, c, tolerance, int(seeds[i * n_restarts + j]))
+                for i, c in enumerate(n_clusters) for j in range(n_restarts)]
+        if executor is not None:
+            results = list(executor.map(_fit_candidate_data_worker, [(data, self.weights, arg) for arg in args]))
+        elif n_workers == 1:
+            results = [self.fit_candidate(*arg) for arg in args]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_EM_worker, initargs=(data, self.weights)) as executor:
+                results = list(executor.map(_fit_candidate_worker, args))
+        opt_table = pd.DataFrame(results)
+        opt_table['restart'] = np.tile(np.arange(n_restarts), len(n_clusters))
+
+        ##  best restart (max LLE) of each n_components
+        best = opt_table.loc[opt_table.groupby('n_components')['LLE'].idxmax()]
+        LLE = list(best['LLE'])
+        BIC_owns, AIC_owns = to_1darray(best['BIC'], best['AIC'])
         ##  get optimal components
         if criteria=='AIC':
-            opt_components = n_clusters[np.argmin(AIC_owns[~np.isnan(AIC_owns)])]
+            opt_components = n_clusters[np.nanargmin(AIC_owns)]
             if figure == True:
                 fig, ax = plt.subplots(figsize=figsize)
                 ax.plot(n_clusters, AIC_owns, '--o')
                 ax.set_xlabel('n_components')
                 ax.set_ylabel('AIC')
         else:
-            opt_components = n_clusters[np.argmin(BIC_owns[~np.isnan(BIC_owns)])]
+            opt_components = n_clusters[np.nanargmin(BIC_owns)]
             if figure == True:
                 fig, ax = plt.subplots(figsize=figsize)
                 ax.plot(n_clusters, BIC_owns, '--o')
                 ax.set_xlabel('n_components')
                 ax.set_ylabel('BIC')
         self.LLE = LLE
-        self.BICs = BICs
-        self.AICs = AICs
         self.BIC_owns = BIC_owns
         self.AIC_owns = AIC_owns
+        self.opt_table = opt_table
         return opt_components
 
+    ##  fit one model of opt_components with seeded random initialization, return a row of opt_table
+    ##  fitted by a new EM of the same data, so rng and fit results of this EM are unchanged
+    def fit_candidate(self, mode, n_components, tolerance, seed):
+        EM_fit = EM(self.data, dim=self.data.shape[1], dtype=self.data.dtype, weights=self.weights, seed=seed)
+        if mode == 'GMM':
+            EM_fit.GMM(n_components=n_components, tolerance=tolerance, rand_init=True)
+        elif mode == 'PEM':
+            EM_fit.PEM(n_components=n_components, tolerance=tolerance, rand_init=True)
+        else:
+            EM_fit.GPEM(n_components=n_components, tolerance=tolerance, rand_init=True)
+        EM_fit.mode = mode
+        return {'n_components': n_components, 'seed': seed, 'LLE': EM_fit.ln_likelihood[0],
+                **EM_fit.get_criteria(), 'converged': EM_fit.converged[0],
+                'n_iter': EM_fit.n_iter, 'para_final': EM_fit.para_final}
+
+    ##  bootstrap confidence interval of PEM, resampling is done by multinomial weights of all samples
+    ##  n_workers > 1: resamples run in a process pool, output: f_CI, tau_CI, (2, n_components) lower and upper bound
+    def PEM_bootstrap(self, n_components, n_bootstrap=100, tolerance=1e-2, censored=None, alpha=0.05,
+                      n_workers=1, seed=None):
+        self.PEM(n_components, tolerance=tolerance, censored=censored)
+        para_init = self.para_final
+        seeds = np.random.SeedSequence(seed).generate_state(n_bootstrap)
+        args = [(n_components, tolerance, censored, para_init, int(seed_i)) for seed_i in seeds]
+        if n_workers == 1:
+            results = [self.fit_bootstrap(*arg) for arg in args]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_EM_worker,
+                                     initargs=(self.data, self.weights)) as executor:
+                results = list(executor.map(_fit_bootstrap_worker, args))
+        f_boot, tau_boot = [np.array(x) for x in zip(*results)]
+        q = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+        f_CI = np.percentile(f_boot, q, axis=0)
+        tau_CI = np.percentile(tau_boot, q, axis=0)
+        self.para_bootstrap = [f_boot, tau_boot]
+        return f_CI, tau_CI
+
+    ##  fit PEM of one bootstrap resample, start from para_init
+    def fit_bootstrap(self, n_components, tolerance, censored, para_init, seed):
+        rng = np.random.default_rng(seed)
+        p = np.ones(len(self.data)) if self.weights is None else self.weights
+        weights = rng.multinomial(int(self.n_samples), p / np.sum(p))
+        EM_boot = EM(self.data, dim=self.data.shape[1], dtype=self.data.dtype, weights=weights)
+        f, tau, s, converged, ln_likelihood = EM_boot.PEM(n_components, tolerance=tolerance, para_init=para_init,
+                                                          censored=censored)
+        return f, tau
+
     ##  get predicted data_cluster and its log-likelihood
-    def predict(self, data, function, paras):
+    def predict(self, data=None, function=None, paras=None, chunk_size=2**16, return_cluster=True):
         """predict data cluster
         Parameters
         ----------
-        paras : list array, ex:[f,m,s] f,m,s : growing array, (n,)
-        ln_likelihood : int
-            Number of components.
-        tolerance : float
-            Convergence criteria
-        data : array (n_samples, k)
+        data : array (n_samples, k), None: fitted data
+        function : log-function of pdf, None: function of self.mode
+        paras : list array, ex:[f,m,s] f,m,s : (n_components,) or growing array, last n_components are used;
+            None: self.para_final
+        chunk_size : int
+            number of samples computed at once
+        return_cluster : bool
+            also return data of each cluster, list of arrays, saved in self.data_cluster
+        Returns
+        -------
+        labels : array, (n_samples,)
+        data_cluster : list of arrays, if return_cluster
+
+        """
+        data = self.__get_predict_data(data)
+        labels = np.empty(len(data), dtype=np.int64)
+        for i, ln_p in self.__iter_ln_p(data, function, paras, chunk_size): ## argmax only, no log-likelihood
+            labels[i:i+chunk_size] = np.argmax(ln_p, axis=0)
+        if return_cluster == False:
+            return labels
+        data_cluster = [data[labels == i] for i in range(self.n_components)]
+        self.data_cluster = data_cluster
+        return labels, data_cluster
 
-        prior_prob: array (n_components, n_sample)
+    ##  posterior probability of each cluster, (n_components, n_samples)
+    def predict_proba(self, data=None, function=None, paras=None, chunk_size=2**16):
+        return self.classify(data, function=function, paras=paras, chunk_size=chunk_size)[1]
 
+    def classify(self, data=None, function=None, paras=None, chunk_size=2**16, proba=True):
+        """Labels, posterior probability and log-likelihood of each sample, computed in chunks of samples
+        Parameters
+        ----------
+        same as predict
+        proba : bool
+            False: posterior probability is not kept, None is returned
         Returns
         -------
+        labels : array, (n_samples,)
+        prior_prob : array, (n_components, n_samples) or None
+        ln_likelihood_samples : array, (n_samples,)
 
         """
-
+        data = self.__get_predict_data(data)
+        n_samples = len(data)
+        labels = np.empty(n_samples, dtype=np.int64)
+        ln_likelihood_samples = np.empty(n_samples, dtype=np.float64)
+        prior_prob = np.empty((self.n_components, n_samples), dtype=data.dtype) if proba else None
+        for i, ln_p in self.__iter_ln_p(data, function, paras, chunk_size):
+            ln_p_sum = logsumexp(ln_p, axis=0)
+            labels[i:i+chunk_size] = np.argmax(ln_p, axis=0)
+            ln_likelihood_samples[i:i+chunk_size] = ln_p_sum
+            if proba:
+                prior_prob[:, i:i+chunk_size] = np.exp(ln_p - ln_p_sum)
+        return labels, prior_prob, ln_likelihood_samples
+
+    ##  yield (start, ln_p) of each chunk of data, ln_p: (n_components, chunk_size)
+    def __iter_ln_p(self, data, function, paras, chunk_size):
+        if function is None:
+            function = self.__get_function()
+        if paras is None:
+            paras = self.para_final
         n_components = self.n_components
-        paras = np.array(paras)[:, -n_components:] ## size to (n_paras, n_components)
-        p = np.exp(function(data, args=paras)) ##(n_components, n_samples)
-        prior_prob = p / sum(p)
-        labels = np.array([np.argmax(prior_prob[:, i]) for i in range(len(data))])  ## find max of prob
-        data_cluster = [data[labels == i] for i in range(n_components)]
-        self.data_cluster = data_cluster
-        # ln_likelihood = sum([np.log(sum(np.exp(function(data[i], args=paras).ravel()))) for i in range(len(data))])
+        paras = [np.asarray(para, dtype=data.dtype).ravel()[-n_components:] for para in paras] ## last iteration if growing
+        for i in range(0, len(data), chunk_size):
+            yield i, function(data[i:i+chunk_size], args=paras)
 
-        # self.ln_likelihood = ln_likelihood
-        return labels, data_cluster
+    def __get_predict_data(self, data):
+        if data is None:
+            return self.data
+        return np.asarray(data, dtype=self.data.dtype).reshape(-1, self.data.shape[1])
+
+    ##  log-function of self.mode without censoring
+    def __get_function(self):
+        return {'GMM': ln_oneD_gaussian, 'PEM': ln_exp_pdf}.get(self.mode, ln_gau_exp_pdf)
 
     def plot_EM_results(self, save=False, path='output.png'):
         para_progress = self.para_progress
@@ -400,7 +611,7 @@ class EM:
             para = self.para_final
         n_components = self.n_components
         fig, ax = self.__plot_survival(data, figsize)
-        x = np.arange(0.01, max(data) + 3*np.std(data), 0.01)
+        x = np.arange(0.01, np.max(data) + 3*np.std(data), 0.01)
         y_fit = exp_survival(x, args=para)
         for i in range(len(para[0])):
             ax.plot(x, y_fit[i, :], '-', color=self.__colors_order()[i])
@@ -455,22 +666,40 @@ class EM:
     def __plot_survival(self, data, figsize=(10,8)):
         data_series = pd.Series(data.ravel())
         E = pd.Series(np.ones(len(data))) ## 1 = death
+        if self.censored is not None:
+            E = pd.Series(~self.censored) ## 0 = censored
         kmf = KaplanMeierFitter()
-        kmf.fit(data_series, event_observed=E)
+        kmf.fit(data_series, event_observed=E, weights=self.weights)
         fig, ax = plt.subplots(figsize=figsize)
-        kmf.plot_survival_function()
+        kmf.plot_survival_function(show_censors=self.censored is not None) ## mark censored dwells
         ax.get_legend().remove() ## remove legend
         plt.show()
         self.kmf = kmf
         return fig, ax
 
     ##  calculate log-likelihood of given parameters, function is log-function
+    ##  per-sample log-likelihood is saved in self.ln_likelihood_samples, (n_samples,)
     def __cal_LLE(self, data, function, para):
-        ln_likelihood = sum([np.log(sum(np.exp(function(data[i,:].reshape(1,-1), args=para).ravel()))) for i in range(data.shape[0])])
-        ln_likelihood = np.array(ln_likelihood, ndmin=1)
+        para = [np.asarray(x, dtype=data.dtype) for x in para]
+        ln_likelihood_samples = logsumexp(function(data, args=para), axis=0) ## sum over components
+        if self.weights is None:
+            ln_likelihood = np.array(np.sum(ln_likelihood_samples, dtype=np.float64), ndmin=1)
+        else:
+            ln_likelihood = np.array(np.sum(ln_likelihood_samples * self.weights), ndmin=1)
+        self.ln_likelihood_samples = ln_likelihood_samples
         self.ln_likelihood = ln_likelihood
         return ln_likelihood
 
+    ##  get per-sample log-likelihood of data with fitted parameters, use fitted data if data is None
+    def score_samples(self, data=None, chunk_size=2**16):
+        if data is None:
+            return self.ln_likelihood_samples
+        return self.classify(data, chunk_size=chunk_size, proba=False)[2]
+
+
+    ##  AIC and BIC of the last fit
+    def get_criteria(self):
+        return {'AIC': self.__AIC()[0], 'BIC': self.__BIC()[0]}
 
     def __AIC(self):
         mode = self.mode
@@ -487,7 +716,7 @@ class EM:
 
     def __BIC(self):
         mode = self.mode
-        n_samples = len(self.data)
+        n_samples = self.n_samples ## sum of weights
         ln_likelihood = self.ln_likelihood
         n_components = self.n_components
         if mode == 'GMM':
@@ -500,64 +729,118 @@ class EM:
         return BIC
 
     ##  initialize mean, std and fraction for GMM
-    def __init_GMM(self, data, n_components, rand_init=False):
+    def __init_GMM(self, data, n_components, rand_init=False, init='kmeans'):
         self.n_components = n_components
         data = data.reshape(-1, 1)
         if rand_init==False:
-            f, m, s = self.__get_f_m_s_kmeans(data)
+            f, m, s = init_gauss(data, n_components, method=init, rng=self.rng, weights=self.weights)
         else:
-            f = np.zeros(n_components)
-            m = np.zeros(n_components)
-            s = np.zeros(n_components)
-            for i in range(n_components):
-                f[i] = random.random()
-                m[i] = random.random()*max(data)
-                s[i] = random.random()*np.std(data) + 0.5
+            f, m, s = init_random(data, n_components, self.rng, scale_s=self.__mean_std(data)[1])
+            s = s + 0.5
             m, f, s = self.__sort_according(m, f, s) ## sort according to first array
-
-        loop = 0
-        improvement = 10
-        return f, m, s, loop, improvement
+        self.f_i = f
+        self.m_i = m
+        self.s_i = s
+        return f, m, s
 
     ##  initialize parameters for Poisson EM
-    def __init_PEM(self, data, n_components, rand_init=False):
+    def __init_PEM(self, data, n_components, rand_init=False, init='moments'):
         # data = self.data
         data = data.reshape(-1, 1)
         self.n_components = n_components
-        mean = np.mean(data)
-        std = np.std(data)
+        mean, std = self.__mean_std(data)
         if rand_init==False:
-            f = np.ones(n_components) / n_components
-            tau = np.linspace(abs(mean - 0.5 * std), mean + 0.5 * std, n_components)
+            if init == 'linspace':
+                f = np.ones(n_components) / n_components
+                tau = np.linspace(abs(mean - 0.5 * std), mean + 0.5 * std, n_components)
+            else:
+                f, tau = init_exp_moments(data, n_components, weights=self.weights)
             s = tau.copy()
         else:
-            f = np.ones(n_components)
-            tau = np.zeros(n_components)
-            s = np.zeros(n_components)
-            for i in range(n_components):
-                f[i] = random.random()
-                tau[i] = random.random()*max(data)
-                s[i] = random.random()*np.std(data)
+            f, tau, s = init_random(data, n_components, self.rng, scale_s=std)
             tau, f, s = self.__sort_according(tau, f, s) ## sort according to first array
 
-        loop = 0
-        improvement = 10
-        return f, tau, s, loop, improvement
-
-    def __get_f_m_s_kmeans(self, data):
-        n_sample = len(data)
-        n_components = self.n_components
-        labels = KMeans(n_clusters=n_components).fit(data).labels_
-        data_cluster = [data[labels == i] for i in range(n_components)]
-        m = np.array([np.mean(data) for data in data_cluster])
-        index = np.argsort(m)
-        f = np.array([len(data) / n_sample for data in data_cluster])[index]
-        m = m[index]
-        s = np.array([np.std(data) for data in data_cluster])[index]
-        self.f_i = f
-        self.m_i = m
-        self.s_i = s
-        return f, m, s
+        return f, tau, s
+
+    ##  log-function of PEM, survival function is used for censored data
+    def __get_PEM_function(self):
+        if self.censored is None:
+            return ln_exp_pdf
+        return partial(ln_exp_pdf_censored, censored=self.censored)
+
+    ##  tau = total time / number of observed (not censored) events of each component
+    def __update_tau_censored(self, data, prior_prob):
+        if self.weights is not None:
+            prior_prob = prior_prob * self.weights
+        tau = np.matmul(prior_prob, data).ravel() / np.matmul(prior_prob, (~self.censored).astype(prior_prob.dtype))
+        self.m = tau
+        return tau
+
+    ##  standard errors of [f, tau] of PEM, score of tau: r * (t/tau^2 - observed/tau)
+    def __cal_SE_PEM(self, data, para):
+        f, tau = para
+        prior_prob = self.__weighting(f, tau, function=self.__get_PEM_function())
+        observed = 1 if self.censored is None else ~self.censored[:, None]
+        score_tau = prior_prob.T * (data / tau**2 - observed / tau)
+        return self.__cal_SE(prior_prob, f, score_tau)
+
+    ##  standard errors of [f, m, s] of GMM
+    def __cal_SE_GMM(self, data, para):
+        f, m, s = para
+        prior_prob = self.__weighting(f, m, s, function=ln_oneD_gaussian)
+        score_m, score_s = self.__get_gauss_scores(prior_prob, data, m, s)
+        return self.__cal_SE(prior_prob, f, score_m, score_s)
+
+    ##  standard errors of [f, m, s, tau] of GPEM
+    def __cal_SE_GPEM(self, data, para):
+        f, m, s, tau = para
+        prior_prob = self.__weighting(f, m, s, tau, function=ln_gau_exp_pdf)
+        score_m, score_s = self.__get_gauss_scores(prior_prob, data[:, :1], m, s)
+        score_tau = prior_prob.T * (data[:, 1:] / tau**2 - 1 / tau)
+        return self.__cal_SE(prior_prob, f, score_m, score_s, score_tau)
+
+    ##  scores of Gaussian mean and std, r * (x-m)/s^2 and r * ((x-m)^2/s^3 - 1/s), output: (n_samples, n_components)
+    def __get_gauss_scores(self, prior_prob, x, m, s):
+        z = (x - m) / s
+        score_m = prior_prob.T * z / s
+        score_s = prior_prob.T * (z**2 - 1) / s
+        return score_m, score_s
+
+    ##  standard errors from empirical information, sum of outer products of per-sample scores
+    ##  f_k = 1 - sum(f_1...f_(k-1)), score of f_i: r_i/f_i - r_k/f_k; scores: (n_samples, n_components) for other parameters
+    def __cal_SE(self, prior_prob, f, *scores):
+        r = prior_prob.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score_f = r[:, :-1] / f[:-1] - r[:, -1:] / f[-1]
+        score = np.concatenate([score_f] + list(scores), axis=1).astype(np.float64)
+        weights = 1 if self.weights is None else self.weights[:, None]
+        n_f = len(f) - 1
+        cov = np.full((score.shape[1], score.shape[1]), np.nan) ## nan SE if information matrix is not invertible
+        if np.all(np.isfinite(score)):
+            try:
+                cov = np.linalg.pinv(np.matmul((score * weights).T, score))
+            except np.linalg.LinAlgError:
+                pass
+        cov_f = cov[:n_f, :n_f]
+        SE_f = np.sqrt(np.append(np.diag(cov_f), np.sum(cov_f))) ## delta method for f_k
+        SE_others = np.sqrt(np.diag(cov)[n_f:]).reshape(len(scores), -1)
+        return [SE_f] + list(SE_others)
+
+    ##  use given parameters as initial parameters
+    def __init_given(self, para_init):
+        para = [np.array(x, dtype=float, ndmin=1) for x in para_init]
+        self.n_components = len(para[0])
+        return para
+
+    ##  mean and std of data with self.weights
+    def __mean_std(self, data, weights=None):
+        if self.weights is None:
+            return np.mean(data), np.std(data)
+        if weights is None:
+            weights = self.weights
+        mean = np.average(data.ravel(), weights=weights)
+        std = np.sqrt(np.average((data.ravel() - mean)**2, weights=weights))
+        return mean, std
 
     ##  calculate the probability belonging to each cluster, (m,s)
     def __weighting(self, *args, function):
@@ -565,96 +848,134 @@ class EM:
         Parameters
         ----------
         function : use log function
-        f, m, s : growing array, (n,)
+        f, m, s : array, (n_components,)
             fractions, mean, std
-        n_components : int
-            Number of components.
         Returns
         -------
         prior_prob : array, (n_components, n_samples)
 
         """
         data = self.data
-        n_components = self.n_components
-        para = []
-        for arg in args:
-            para += [arg[-n_components:]]
-
-        p = np.exp(function(data, args=para)) ##(n_components, n_samples)
-        prior_prob = p / sum(p)
-        self.p = p
+        para = [np.asarray(arg, dtype=data.dtype) for arg in args] ## keep dtype of data, e.g. float32
+        ln_p = function(data, args=para) ##(n_components, n_samples)
+        ##  log-sum-exp: prior_prob = p / sum(p) with p shifted by its max, computed in place
+        ln_p_max = np.max(ln_p, axis=0)
+        ln_p -= ln_p_max
+        prior_prob = np.exp(ln_p, out=ln_p)
+        p_sum = np.sum(prior_prob, axis=0)
+        prior_prob /= p_sum
         self.prior_prob = prior_prob
+        ##  log-likelihood of given parameters for convergence of EM loops
+        ln_likelihood_samples = ln_p_max + np.log(p_sum)
+        if self.weights is not None:
+            ln_likelihood_samples = ln_likelihood_samples * self.weights
+        self.ln_likelihood_iter = np.sum(ln_likelihood_samples, dtype=np.float64)
 
         return prior_prob
 
 
     ##  update mean, std and fraction using matrix multiplication, (n_feture, n_sample) * (n_sample, 1) = (n_feture, 1)
-    def __update_f_m_s(self, data, prior_prob, f, m, s):
+    def __update_f_m_s(self, data, prior_prob):
         """M-step
         Parameters
         ----------
-        f, m, s : growing array, (n,)
-            fractions, mean, std
-        n_components : int
-            Number of components.
-        data(n_sample, 1) - m(n_components,) : array, (n_sample, n_components)
+        data : array, (n_sample, 1)
+        prior_prob : array, (n_components, n_samples)
         Returns
         -------
-        prior_prob : array, (n_components, n_samples)
+        f, m, s : array, (n_components,)
+            fractions, mean, std
 
         """
-        # data = self.data
         s_lower = self.s_lower
-        n_sample = len(data)
-        # n_components = self.n_components
-        f_new = np.sum(prior_prob, axis=1) / n_sample
-        m_new = np.matmul(prior_prob, data).ravel() / np.sum(prior_prob, axis=1)
-        s_new = np.sqrt( np.matmul(prior_prob, data**2).ravel()/(np.sum(prior_prob, axis=1)) - m_new**2 )
+        n_sample = self.n_samples
+        data = data.reshape(-1, 1)
+        if self.weights is not None:
+            prior_prob = prior_prob * self.weights ## weighted samples
+        weight = np.sum(prior_prob, axis=1, dtype=np.float64)
+        f_new = weight / n_sample
+        m_new = np.matmul(prior_prob, data).ravel() / weight
+        s_new = np.sqrt( np.matmul(prior_prob, data**2).ravel() / weight - m_new**2 )
         if any(s_new <= s_lower) or any(np.isnan(s_new)):
-            s_new[s_new <= s_lower] = random.random()+0.5
-            s_new[np.isnan(s_new)] = random.random()+0.5
-
-        f, m, s = self.__append_arrays([f,f_new], [m,m_new], [s,s_new])
-        self.f = f
-        self.m = m
-        self.s = s
-        return f, m, s
-
-    def __append_arrays(self, *args):
-        arrays = []
-        for arg in args:
-            arrays += [np.append(arg[0], arg[1])]
-        return arrays
-
-    ##  calculate max improvement among all parameters
-    def __cal_improvement(self, *args):
-        ##  arg: [f, m, s], not reshaped array
-        """Calculate prior probability of each data point
-                Parameters
-                ----------
-                f, m, s : growing array, (n,)
-                    fractions, mean, std
-                Returns
-                -------
-                prior_prob : array, (n_components, n_samples)
-
-        """
-        n_components = self.n_components
-        improvement = []
-        for arg in args:
-            # arg = np.array(arg)
-            arg_old = arg[-2*n_components:-n_components] ##  last 2n to last n
-            arg_new = arg[-n_components:]
-            diff = abs(arg_new - arg_old)
-            improvement = max(np.append(improvement, diff)) ## take max of all args diff
-        return improvement
-
-    ##  reshape all arrays to (loop,n_components)
-    def __reshape_all(self, *args, n_rows, n_cols):
-        results = []
+            s_new[s_new <= s_lower] = self.rng.random()+0.5
+            s_new[np.isnan(s_new)] = self.rng.random()+0.5
+
+        self.f = f_new
+        self.m = m_new
+        self.s = s_new
+        return f_new, m_new, s_new
+
+    ##  shared EM loop, step(*para) returns parameters of next iteration
+    ##  the first n_track parameters are used for convergence, log-likelihood of each loop is from E-step
+    def __iterate(self, step, para, n_track, tolerance, tol_LLE, min_iter, max_iter, accelerate=False):
+        para_progress = self.__init_progress(max_iter, *para)
+        ln_likelihood_progress = np.zeros(max_iter + 1)
+        self.n_eval = 0
+        loop = 0
+        stop = False
+        while not stop:
+            if accelerate:
+                para = self.__squarem_step(step, para, n_track)
+            else:
+                para = self.__EM_step(step, para)
+            ln_likelihood_progress[loop] = self.ln_likelihood_iter ## log-likelihood of parameters of previous loop
+            loop += 1
+            rel_para = self.__record_progress(para_progress, loop, *para, n_track=n_track)
+            rel_LLE = np.inf if loop == 1 else rel_change_LLE(ln_likelihood_progress[loop-1], ln_likelihood_progress[loop-2])
+            converged, stop = check_convergence(loop, rel_LLE, rel_para, tolerance=tolerance, tol_LLE=tol_LLE,
+                                                min_iter=min_iter, max_iter=max_iter)
+        self.ln_likelihood_progress = ln_likelihood_progress[:loop]
+        self.n_iter = loop
+        self.converged_reason = str(get_reason(converged))
+        return para_progress, loop, bool(converged)
+
+    ##  one EM step, counts the likelihood evaluation of E-step
+    def __EM_step(self, step, para):
+        self.n_eval += 1
+        return list(step(*para))
+
+    ##  SQUAREM (Varadhan & Roland 2008, S3 step length): extrapolate from two EM steps, then one EM step to stabilize
+    ##  if log-likelihood decreases or becomes nan (e.g. negative f, s or tau), step length is halved toward alpha = -1
+    ##  up to n_backtrack times, then falls back to a plain EM step from the second EM step
+    def __squarem_step(self, step, para, n_track, n_backtrack=3):
+        para_1 = self.__EM_step(step, para)
+        ln_likelihood_0 = self.ln_likelihood_iter
+        para_2 = self.__EM_step(step, para_1)
+        r = [p1 - p0 for p0, p1 in zip(para[:n_track], para_1[:n_track])]
+        v = [p2 - p1 - ri for p1, p2, ri in zip(para_1[:n_track], para_2[:n_track], r)]
+        r_norm = np.sqrt(sum([np.sum(ri**2) for ri in r]))
+        v_norm = np.sqrt(sum([np.sum(vi**2) for vi in v]))
+        alpha = -1 if v_norm == 0 else min(-r_norm / v_norm, -1) ## alpha = -1 gives para_2
+        for i in range(n_backtrack + 1):
+            if alpha == -1:
+                break
+            para_ex = [p0 - 2 * alpha * ri + alpha**2 * vi for p0, ri, vi in zip(para[:n_track], r, v)]
+            para_ex += para_2[n_track:]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                para_new = self.__EM_step(step, para_ex)
+            if self.ln_likelihood_iter >= ln_likelihood_0: ## False for nan
+                self.ln_likelihood_iter = ln_likelihood_0
+                return para_new
+            alpha = (alpha - 1) / 2
+        para_new = self.__EM_step(step, para_2)
+        self.ln_likelihood_iter = ln_likelihood_0
+        return para_new
+
+    ##  preallocate parameter progress, (max loop + 1, n_components) for each parameter
+    def __init_progress(self, max_iter, *args):
+        para_progress = []
         for arg in args:
-            results += [np.reshape(arg, (n_rows, n_cols))]
-        return results
+            para = np.zeros((max_iter + 1, len(arg)))
+            para[0] = arg
+            para_progress += [para]
+        return para_progress
+
+    ##  save parameters of this loop, return relative change of the first n_track parameters
+    def __record_progress(self, para_progress, loop, *args, n_track):
+        for para, arg in zip(para_progress, args):
+            para[loop] = arg
+        return rel_change_para([para[loop] for para in para_progress[:n_track]],
+                               [para[loop-1] for para in para_progress[:n_track]])
 
     def __sort_according(self, *args):
         index = np.argsort(args[0])
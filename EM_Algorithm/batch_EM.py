@@ -0,0 +1,141 @@
+### import used modules first
+import numpy as np
+from scipy.special import logsumexp
+from EM_Algorithm.initialization import init_exp_moments
+from EM_Algorithm.convergence import rel_change_LLE, rel_change_para, check_convergence, get_reason
+
+
+### datasets: list of 1D arrays with different lengths, padded to (n_datasets, n_max) with mask
+class BatchEM:
+    def __init__(self, datasets, dtype=np.float64, seed=None):
+        datasets = [np.asarray(data, dtype=dtype).ravel() for data in datasets]
+        self.n_datasets = len(datasets)
+        self.n_samples = np.array([len(data) for data in datasets])
+        self.data, self.mask = self.__pad(datasets, dtype)
+        self.s_lower = 1
+        self.rng = np.random.default_rng(seed)
+
+    def PEM(self, n_components, tolerance=1e-2, rand_init=False, init='moments', tol_LLE=1e-6, min_iter=20, max_iter=500):
+        """EM algorithm with pdf=exponential for all datasets, same as EM.PEM of each dataset
+        Parameters
+        ----------
+        n_components : int
+            Number of components.
+        tolerance, tol_LLE, min_iter, max_iter :
+            Convergence criteria, same as EM.PEM
+        init : str
+            'moments' or 'linspace', same as EM.PEM
+        Returns
+        -------
+        f, tau, s : array, (n_datasets, n_components)
+        converged : array, (n_datasets, n_components)
+        ln_likelihood : array, (n_datasets,)
+
+        """
+        data = self.data
+        mask = self.mask
+        self.n_components = n_components
+        self.tolerance = tolerance
+        f, tau, s = self.__init_PEM(n_components, rand_init=rand_init, init=init)
+        ##  each dataset stops updating after it converges, all datasets move in lockstep
+        loop = np.zeros(self.n_datasets, dtype=int)
+        converged = np.zeros(self.n_datasets, dtype=bool)
+        active = np.ones(self.n_datasets, dtype=bool)
+        ln_likelihood_old = np.full(self.n_datasets, np.nan)
+        while any(active):
+            index = np.flatnonzero(active) ## only update datasets not finished
+            prior_prob, ln_likelihood = self.__weighting(data[index], mask[index], f[index], tau[index])
+            f_new, tau_new, s_new = self.__update_f_m_s(data[index], prior_prob, self.n_samples[index])
+            rel_para = rel_change_para([f_new, tau_new], [f[index], tau[index]])
+            rel_LLE = np.where(loop[index] == 0, np.inf, rel_change_LLE(ln_likelihood, ln_likelihood_old[index]))
+            f[index], tau[index], s[index] = f_new, tau_new, s_new
+            ln_likelihood_old[index] = ln_likelihood
+            loop[index] += 1
+            converged[index], stop = check_convergence(loop[index], rel_LLE, rel_para, tolerance=tolerance,
+                                                       tol_LLE=tol_LLE, min_iter=min_iter, max_iter=max_iter)
+            active[index] = ~stop
+        tau, f, s = self.__sort_according(tau, f, s)
+        self.para_final = [f, tau]
+        self.n_iter = loop
+        self.converged_reason = get_reason(converged)
+        ln_likelihood = self.__cal_LLE(data, mask, f, tau)
+        converged = np.repeat(converged[:, None], n_components, axis=1)
+        self.converged = converged
+        return f, tau, s, converged, ln_likelihood
+
+    ##  pad datasets with zeros, mask: True for data
+    def __pad(self, datasets, dtype):
+        n_max = max(self.n_samples)
+        data = np.zeros((self.n_datasets, n_max), dtype=dtype)
+        mask = np.zeros((self.n_datasets, n_max), dtype=bool)
+        for i, x in enumerate(datasets):
+            data[i, :len(x)] = x
+            mask[i, :len(x)] = True
+        return data, mask
+
+    ##  initialize parameters for Poisson EM, same as EM.__init_PEM
+    def __init_PEM(self, n_components, rand_init=False, init='moments'):
+        n_samples = self.n_samples
+        mean = np.sum(self.data, axis=1) / n_samples
+        std = np.sqrt(np.sum(self.mask * (self.data - mean[:, None])**2, axis=1) / n_samples)
+        if rand_init == False:
+            if init == 'linspace':
+                f = np.ones((self.n_datasets, n_components)) / n_components
+                tau = np.linspace(abs(mean - 0.5 * std), mean + 0.5 * std, n_components, axis=1)
+            else:
+                f, tau = [np.array(x) for x in zip(*[init_exp_moments(data[mask], n_components)
+                                                     for data, mask in zip(self.data, self.mask)])]
+            s = tau.copy()
+        else:
+            rand = self.rng.random((self.n_datasets, 3 * n_components))
+            f = rand[:, :n_components]
+            tau = rand[:, n_components:2*n_components] * np.max(self.data, axis=1)[:, None]
+            s = rand[:, 2*n_components:] * std[:, None]
+            tau, f, s = self.__sort_according(tau, f, s)
+        return f, tau, s
+
+    ##  calculate the probability belonging to each cluster, output: (n_datasets, n_components, n_max)
+    ##  and log-likelihood of given parameters of each dataset, (n_datasets,)
+    def __weighting(self, data, mask, f, tau):
+        ln_p = self.__ln_exp_pdf(data, f, tau)
+        ln_p_max = np.max(ln_p, axis=1, keepdims=True)
+        ln_p -= ln_p_max
+        prior_prob = np.exp(ln_p, out=ln_p)
+        p_sum = np.sum(prior_prob, axis=1, keepdims=True)
+        prior_prob /= p_sum
+        prior_prob *= mask[:, None, :] ## no weight for padding
+        ln_likelihood = np.sum((ln_p_max + np.log(p_sum))[:, 0, :] * mask, axis=1, dtype=np.float64)
+        return prior_prob, ln_likelihood
+
+    ##  update tau, std and fraction of all datasets
+    def __update_f_m_s(self, data, prior_prob, n_samples):
+        s_lower = self.s_lower
+        weight = np.sum(prior_prob, axis=2, dtype=np.float64)
+        f_new = weight / n_samples[:, None]
+        m_new = np.matmul(prior_prob, data[:, :, None])[:, :, 0] / weight
+        s_new = np.sqrt( np.matmul(prior_prob, data[:, :, None]**2)[:, :, 0] / weight - m_new**2 )
+        bad = (s_new <= s_lower) | np.isnan(s_new)
+        if np.any(bad):
+            s_new[bad] = self.rng.random()+0.5
+        return f_new, m_new, s_new
+
+    ##  log-likelihood of each dataset
+    def __cal_LLE(self, data, mask, f, tau):
+        ln_likelihood_samples = logsumexp(self.__ln_exp_pdf(data, f, tau), axis=1) ## sum over components
+        ln_likelihood = np.sum(ln_likelihood_samples * mask, axis=1, dtype=np.float64)
+        self.ln_likelihood = ln_likelihood
+        return ln_likelihood
+
+    ##  f, tau: (n_datasets, n_components), data: (n_datasets, n_max), output: (n_datasets, n_components, n_max)
+    def __ln_exp_pdf(self, data, f, tau):
+        f = np.asarray(f, dtype=data.dtype)[:, :, None]
+        tau = np.asarray(tau, dtype=data.dtype)[:, :, None]
+        return np.log(f) - np.log(tau) - data[:, None, :] / tau
+
+    ##  sort parameters of each dataset according to the first array
+    def __sort_according(self, *args):
+        index = np.argsort(args[0], axis=1)
+        results = []
+        for arg in args:
+            results += [np.take_along_axis(np.array(arg), index, axis=1)]
+        return results
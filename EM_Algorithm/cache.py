@@ -0,0 +1,78 @@
+### on-disk cache of EM fit results, one pickle file per fit named by sha256 of data and fit parameters
+### least recently used files are removed when total size exceeds max_size
+import numpy as np
+import hashlib
+import pickle
+import os
+
+
+class FitCache:
+    def __init__(self, path=None, max_size=512 * 2**20):
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.EM_cache')
+        self.path = path
+        self.max_size = max_size ## bytes
+        os.makedirs(path, exist_ok=True)
+
+    ##  sha256 of data, weights and fit parameters, e.g. fit='PEM', n_components=2, tolerance=1e-2, seed=0
+    def get_key(self, data, weights=None, **para):
+        hash_obj = hashlib.sha256()
+        self.__update_hash(hash_obj, data)
+        self.__update_hash(hash_obj, weights)
+        for name in sorted(para):
+            hash_obj.update(name.encode())
+            self.__update_hash(hash_obj, para[name])
+        return hash_obj.hexdigest()
+
+    ##  cached entry of key, None if not cached
+    def load(self, key):
+        path = self.__get_path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        os.utime(path) ## recently used
+        return entry
+
+    def save(self, key, entry):
+        path = self.__get_path(key)
+        path_tmp = f'{path}.{os.getpid()}.tmp'
+        with open(path_tmp, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path_tmp, path) ## no partial file if interrupted
+        self.__evict()
+
+    def clear(self):
+        for path in self.__get_files():
+            os.remove(path)
+
+    ##  remove least recently used files until total size <= max_size
+    def __evict(self):
+        files = sorted(self.__get_files(), key=os.path.getmtime)
+        sizes = [os.path.getsize(path) for path in files]
+        size_total = sum(sizes)
+        for path, size in zip(files, sizes):
+            if size_total <= self.max_size:
+                break
+            os.remove(path)
+            size_total -= size
+
+    def __get_files(self):
+        return [os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith('.pkl')]
+
+    def __get_path(self, key):
+        return os.path.join(self.path, f'{key}.pkl')
+
+    ##  arrays are hashed by dtype, shape and bytes, lists by their items, others by repr
+    def __update_hash(self, hash_obj, value):
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value)
+            hash_obj.update(f'{value.dtype.str}{value.shape}'.encode())
+            hash_obj.update(value.tobytes())
+        elif isinstance(value, (list, tuple)):
+            hash_obj.update(f'{type(value).__name__}{len(value)}'.encode())
+            for x in value:
+                self.__update_hash(hash_obj, x)
+        else:
+            hash_obj.update(repr(value).encode())
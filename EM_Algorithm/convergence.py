@@ -0,0 +1,45 @@
+### convergence criteria shared by all EM loops (EM, BatchEM)
+### inputs are scalars for one fit, or arrays with one value per dataset for BatchEM
+import numpy as np
+
+
+##  relative change of total log-likelihood
+def rel_change_LLE(ln_likelihood, ln_likelihood_old):
+    ln_likelihood = np.asarray(ln_likelihood, dtype=np.float64)
+    ln_likelihood_old = np.asarray(ln_likelihood_old, dtype=np.float64)
+    return abs(ln_likelihood - ln_likelihood_old) / np.maximum(abs(ln_likelihood_old), np.finfo(np.float64).tiny)
+
+##  largest change of each parameter relative to its largest magnitude, maximum over parameters
+##  para_new, para_old: lists of arrays, (n_components,) or (n_datasets, n_components)
+def rel_change_para(para_new, para_old):
+    change = 0
+    for new, old in zip(para_new, para_old):
+        scale = np.maximum(np.max(abs(old), axis=-1), np.finfo(np.float64).tiny)
+        change = np.maximum(change, np.max(abs(new - old), axis=-1) / scale)
+    return change
+
+def check_convergence(loop, rel_LLE, rel_para, tolerance=1e-2, tol_LLE=1e-6, min_iter=20, max_iter=500):
+    """Check whether EM loops stop
+    Parameters
+    ----------
+    loop : int or array
+        number of iterations done
+    rel_LLE, rel_para : float or array
+        relative change of log-likelihood and parameters of the last iteration
+    tolerance : float
+        criteria of rel_para
+    tol_LLE : float
+        criteria of rel_LLE
+    Returns
+    -------
+    converged : bool or array, both criteria are met
+    stop : bool or array, converged after min_iter loops, or max_iter is reached
+
+    """
+    converged = (rel_LLE < tol_LLE) & (rel_para < tolerance)
+    stop = (loop >= max_iter) | (converged & (loop >= min_iter))
+    return converged, stop
+
+##  'tolerance' if converged, else 'max_iter'
+def get_reason(converged):
+    return np.where(converged, 'tolerance', 'max_iter')
@@ -16,5 +16,5 @@ if __name__ == "__main__":
     n_sample = 200
     data = gen_gauss(mean=[5, 15, 25], std=[2, 2, 2], n_sample=[n_sample,n_sample,n_sample])
     bin_number = np.log2(len(data)).astype('int') + 1
-    pd, center = binning(data, bin_number)
+    pd, center, fig, ax = binning(data, bin_number)
 
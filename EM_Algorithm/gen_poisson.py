@@ -15,4 +15,4 @@ if __name__ == "__main__":
     data = gen_poisson(tau=[2], n_sample=[n_sample])
     bin_width = (12/n_sample)**(1/3)*np.mean(data) ## scott's formula for poisson process
     bin_number = int((max(data)-min(data))/bin_width)
-    pd, center = binning(data, bin_number, xlabel='dwell time (s)')
\ No newline at end of file
+    pd, center, fig, ax = binning(data, bin_number, xlabel='dwell time (s)')
\ No newline at end of file
@@ -0,0 +1,105 @@
+### initial parameters of EM, all in NumPy for 1D data (n_samples,) or (n_samples, 1)
+### weights: (n_samples,) counts of each sample or None, rng: numpy.random.Generator
+import numpy as np
+
+
+##  weighted mean and std of each label, f is fraction of total weight, empty cluster has nan m and s
+def get_f_m_s(x, labels, n_components, weights=None):
+    x = np.asarray(x, dtype=np.float64).ravel()
+    w = np.ones(len(x)) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+    weight = np.bincount(labels, weights=w, minlength=n_components)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        m = np.bincount(labels, weights=w * x, minlength=n_components) / weight
+        s = np.sqrt(np.clip(np.bincount(labels, weights=w * x**2, minlength=n_components) / weight - m**2, 0, None))
+    f = weight / np.sum(w)
+    return f, m, s
+
+##  split sorted data into n_components groups of equal weight, deterministic
+def init_quantile(x, n_components, weights=None):
+    x = np.asarray(x, dtype=np.float64).ravel()
+    w = np.ones(len(x)) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+    index = np.argsort(x, kind='stable')
+    w_cum = np.cumsum(w[index]) - w[index] / 2 ## weight at the middle of each sample
+    labels = np.empty(len(x), dtype=np.int64)
+    labels[index] = np.minimum((w_cum / np.sum(w) * n_components).astype(np.int64), n_components - 1)
+    return get_f_m_s(x, labels, n_components, weights=weights)
+
+##  k-means++ seeding, the first center is drawn by weights and the others with probability ~ weights * D^2
+def kmeanspp_centers(x, n_components, rng, weights=None):
+    x = np.asarray(x, dtype=np.float64).ravel()
+    w = np.ones(len(x)) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+    centers = [x[rng.choice(len(x), p=w / np.sum(w))]]
+    d2 = (x - centers[0])**2
+    for i in range(1, n_components):
+        p = w * d2
+        if np.sum(p) == 0: ## fewer distinct values than n_components
+            p = w
+        centers += [x[rng.choice(len(x), p=p / np.sum(p))]]
+        d2 = np.minimum(d2, (x - centers[-1])**2)
+    return np.sort(centers)
+
+##  Lloyd iterations of 1D k-means, labels by searchsorted on midpoints of sorted centers
+def kmeans_1d(x, centers, weights=None, max_iter=100):
+    x = np.asarray(x, dtype=np.float64).ravel()
+    centers = np.sort(np.asarray(centers, dtype=np.float64))
+    n_components = len(centers)
+    for i in range(max_iter):
+        labels = np.searchsorted((centers[:-1] + centers[1:]) / 2, x)
+        f, m, s = get_f_m_s(x, labels, n_components, weights=weights)
+        m = np.where(np.isnan(m), centers, m) ## keep center of empty cluster
+        converged = np.all(m == centers)
+        centers = np.sort(m)
+        if converged:
+            break
+    labels = np.searchsorted((centers[:-1] + centers[1:]) / 2, x)
+    return labels
+
+##  initial f, m, s of GMM: 'quantile', 'kmeans' (k-means seeded by quantiles, deterministic) or 'kmeans++'
+def init_gauss(x, n_components, method='kmeans', rng=None, weights=None):
+    if method == 'quantile':
+        f, m, s = init_quantile(x, n_components, weights=weights)
+    else:
+        if method == 'kmeans':
+            centers = init_quantile(x, n_components, weights=weights)[1]
+        else:
+            centers = kmeanspp_centers(x, n_components, rng, weights=weights)
+        labels = kmeans_1d(x, np.nan_to_num(centers), weights=weights)
+        f, m, s = get_f_m_s(x, labels, n_components, weights=weights)
+    ##  empty or single-valued clusters
+    m = np.where(np.isnan(m), np.nanmean(m), m)
+    s = np.where(np.isnan(s) | (s == 0), np.nanmax(np.append(s, 1)), s)
+    f = np.where(f == 0, 1e-3, f)
+    f = f / np.sum(f)
+    index = np.argsort(m)
+    return f[index], m[index], s[index]
+
+##  initial f, tau of exponential mixture, equal f and log-spaced tau matching the first two moments of data
+##  mixture: E[t] = sum(f*tau), E[t^2] = 2*sum(f*tau^2), tau = mean * c with mean(c) = 1 and mean(c^2) = E[t^2]/(2*mean^2)
+def init_exp_moments(t, n_components, weights=None, min_spread=0.2):
+    t = np.asarray(t, dtype=np.float64).ravel()
+    w = np.ones(len(t)) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+    mean = np.average(t, weights=w)
+    target = np.average(t**2, weights=w) / (2 * mean**2)
+    f = np.ones(n_components) / n_components
+    if n_components == 1:
+        return f, np.array([mean])
+    ##  c = exp(a*linspace(-1, 1)) / mean(c), mean(c^2) increases with a, bisection for a
+    grid = np.linspace(-1, 1, n_components)
+    ratio = lambda a: np.mean(np.exp(2 * a * grid)) / np.mean(np.exp(a * grid))**2
+    a_lower, a_upper = 0, 10
+    for i in range(60):
+        a = (a_lower + a_upper) / 2
+        if ratio(a) < target:
+            a_lower = a
+        else:
+            a_upper = a
+    a = max(a, min_spread) ## distinct taus even if data looks like a single exponential
+    c = np.exp(a * grid)
+    tau = mean * c / np.mean(c)
+    return f, tau
+
+##  random initial parameters, same distributions as the former random.random() loops
+def init_random(x, n_components, rng, scale_s):
+    x = np.asarray(x, dtype=np.float64).ravel()
+    f, m, s = rng.random((3, n_components))
+    return f, m * np.max(x), s * scale_s
@@ -0,0 +1,112 @@
+### import used modules first
+from EM_Algorithm.EM import EM
+from basic.math_fn import ln_oneD_gaussian, ln_exp_pdf, ln_gau_exp_pdf
+import numpy as np
+from scipy.special import logsumexp
+
+
+### stepwise EM for data arriving in batches, mode: 'GMM', 'PEM' or 'GPEM'
+### data of a batch: (n,1)-array for GMM/PEM, (n,2)-array of (step, dwell) for GPEM
+class OnlineEM:
+    def __init__(self, n_components, mode='GMM', step_exponent=0.6, seed=None):
+        self.n_components = n_components
+        self.mode = mode
+        self.step_exponent = step_exponent ## step size = (n_steps + 1)^(-step_exponent), 0.5 < step_exponent <= 1
+        self.dim = 2 if mode == 'GPEM' else 1
+        self.function = {'GMM': ln_oneD_gaussian, 'PEM': ln_exp_pdf, 'GPEM': ln_gau_exp_pdf}[mode]
+        self.para_final = None
+        self.stats = None
+        self.n_steps = 0
+        self.n_samples = 0
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.s_lower = 1 ## same lower bound of std as EM
+
+    def partial_fit(self, data, batch_size=None):
+        """Update parameters with a new batch of data
+        Parameters
+        ----------
+        data : array (n_samples, dim)
+        batch_size : int
+            data is split into mini-batches of batch_size, one stepwise update for each; None: one update
+        Returns
+        -------
+        para_final : list of array, same as EM.para_final
+
+        """
+        data = np.asarray(data, dtype=float).reshape(-1, self.dim)
+        if self.para_final is None:  ## first batch is fitted by EM to initialize
+            self.__init_para(data)
+        else:
+            if batch_size is None:
+                batch_size = len(data)
+            for i in range(0, len(data), batch_size):
+                self.__step(data[i:i + batch_size])
+        self.n_samples += len(data)
+        return self.para_final
+
+    ##  full-batch EM starting from current parameters, data can be all or part of data seen
+    def polish(self, data, tolerance=1e-2):
+        data = np.asarray(data, dtype=float).reshape(-1, self.dim)
+        EM_polish = EM(data, dim=self.dim, seed=self.seed)
+        fit = {'GMM': EM_polish.GMM, 'PEM': EM_polish.PEM, 'GPEM': EM_polish.GPEM}[self.mode]
+        results = fit(self.n_components, tolerance=tolerance, para_init=self.para_final)
+        self.para_final = EM_polish.para_final
+        self.stats = self.__get_stats(data, self.para_final)
+        return results
+
+    ##  log-likelihood of data with current parameters
+    def score(self, data):
+        data = np.asarray(data, dtype=float).reshape(-1, self.dim)
+        return np.sum(logsumexp(self.function(data, args=self.para_final), axis=0))
+
+    def __init_para(self, data):
+        EM_init = EM(data, dim=self.dim, seed=self.seed)
+        if self.mode == 'GMM':
+            EM_init.GMM(self.n_components)
+        elif self.mode == 'PEM':
+            EM_init.PEM(self.n_components)
+        else:
+            EM_init.GPEM(self.n_components)
+        self.para_final = EM_init.para_final
+        self.stats = self.__get_stats(data, self.para_final)
+        self.n_steps = 1
+
+    ##  stepwise update: stats = (1 - step) * stats + step * stats of batch
+    def __step(self, data):
+        step = (self.n_steps + 1) ** (-self.step_exponent)
+        stats_batch = self.__get_stats(data, self.para_final)
+        self.stats = {key: (1 - step) * self.stats[key] + step * stats_batch[key] for key in self.stats}
+        self.para_final = self.__get_para(self.stats)
+        self.n_steps += 1
+
+    ##  E-step of a batch, return sufficient statistics averaged over samples, each (n_components,)
+    def __get_stats(self, data, para):
+        ln_p = self.function(data, args=para) ##(n_components, n_samples)
+        prior_prob = np.exp(ln_p - logsumexp(ln_p, axis=0))
+        n = data.shape[0]
+        stats = {'w': np.sum(prior_prob, axis=1) / n}
+        if self.mode == 'PEM':
+            stats['t'] = np.matmul(prior_prob, data[:, 0]) / n
+        else:
+            stats['x'] = np.matmul(prior_prob, data[:, 0]) / n
+            stats['xx'] = np.matmul(prior_prob, data[:, 0]**2) / n
+        if self.mode == 'GPEM':
+            stats['t'] = np.matmul(prior_prob, data[:, 1]) / n
+        return stats
+
+    ##  M-step from sufficient statistics, same parameter order as EM.para_final
+    def __get_para(self, stats):
+        w = stats['w']
+        f = w / np.sum(w)
+        if self.mode == 'PEM':
+            return [f, stats['t'] / w]
+        m = stats['x'] / w
+        s = np.sqrt(np.clip(stats['xx'] / w - m**2, 0, None))
+        ##  same reset of small or nan std as EM
+        if any(s <= self.s_lower) or any(np.isnan(s)):
+            s[s <= self.s_lower] = self.rng.random()+0.5
+            s[np.isnan(s)] = self.rng.random()+0.5
+        if self.mode == 'GMM':
+            return [f, m, s]
+        return [f, m, s, stats['t'] / w]
@@ -1,5 +1,7 @@
 from basic.select import get_mat, get_files
-from FRET.cluster_FRET_one import get_params, collect_params
+from FRET.cluster_FRET_one import get_params, get_params_batch, collect_params
+from EM_Algorithm.cache import FitCache
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 import random
@@ -36,6 +38,9 @@ if __name__ == '__main__':
 
 
     n_component = 3 ## if None, auto-find n
+    n_workers = 4 ## processes for auto-finding n, one pool for all files
+    cache = FitCache() ## reuse EM results of unchanged data
+    executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
     all_path = get_files('*.mat')
     # all_path = r'/home/hwligroup/Desktop/vbFRET_dwell time/*.mat'
 
@@ -50,22 +55,30 @@ if __name__ == '__main__':
         LLE_on, LLE_off = [], []
 
         m_shape = len(dwell)
+        ## EM of all 'on' dwell sets at once if n_component is given
+        if n_component != None:
+            dwell_on_all = [dwell[m_shape-i, m_shape-i-1] for i in range(1,len(dwell))]
+            EM_p_on, f_tau_on_all, tau_on_all, s_tau_on_all, converged_on_all, LLE_on_all = get_params_batch(dwell_on_all, n_component, seed=0)
+            EM_on = EM_p_on ## one BatchEM of all 'on' dwell sets
         for i in range(1,len(dwell)):
 
             dwell_on = dwell[m_shape-i, m_shape-i-1]
             dwell_off = dwell[m_shape-i-1, m_shape-i]
             ## EM
-            EM_p_on, f_tau_on, tau_i_on, s_tau_on, converged_p_on, ln_likelihood_on = get_params(dwell_on, n_component)
-            EM_p_off, f_tau_off, tau_i_off, s_tau_off, converged_p_off, ln_likelihood_off = get_params(dwell_off)
+            if n_component != None:
+                f_tau_on, tau_i_on, ln_likelihood_on = f_tau_on_all[i-1], tau_on_all[i-1], LLE_on_all[i-1:i]
+            else:
+                EM_p_on, f_tau_on, tau_i_on, s_tau_on, converged_p_on, ln_likelihood_on = get_params(dwell_on, n_component, cache=cache, seed=0, executor=executor)
+                EM_on += [EM_p_on]
+            EM_p_off, f_tau_off, tau_i_off, s_tau_off, converged_p_off, ln_likelihood_off = get_params(dwell_off, cache=cache, seed=0, executor=executor)
             ## store results
-            EM_on, EM_off, f_on, f_off, tau_on, tau_off, LLE_on, LLE_off = collect_params([EM_on, EM_p_on],
-                                                                                          [EM_off, EM_p_off],
-                                                                                          [f_on, f_tau_on],
-                                                                                          [f_off, f_tau_off],
-                                                                                          [tau_on, tau_i_on],
-                                                                                          [tau_off, tau_i_off],
-                                                                                          [LLE_on, ln_likelihood_on],
-                                                                                          [LLE_off, ln_likelihood_off])
+            EM_off, f_on, f_off, tau_on, tau_off, LLE_on, LLE_off = collect_params([EM_off, EM_p_off],
+                                                                                 [f_on, f_tau_on],
+                                                                                 [f_off, f_tau_off],
+                                                                                 [tau_on, tau_i_on],
+                                                                                 [tau_off, tau_i_off],
+                                                                                 [LLE_on, ln_likelihood_on],
+                                                                                 [LLE_off, ln_likelihood_off])
 
             # EM_p.plot_fit_exp(xlim=[0, 10])
 
@@ -88,4 +101,6 @@ if __name__ == '__main__':
         writer = pd.ExcelWriter( f'{gen_random_code(3)}_{name}_EM_results.xlsx')
         for i in range(2):
             df[i].to_excel(writer, sheet_name=sheet_names[i], index=True)
-        writer.save()
\ No newline at end of file
+        writer.save()
+    if executor is not None:
+        executor.shutdown()
@@ -1,16 +1,27 @@
 from basic.select import get_mat
 from EM_Algorithm.EM import EM
+from EM_Algorithm.batch_EM import BatchEM
 import os
 
-def get_params(dwell, n_component=None):
-    EM_p = EM(dwell)
+##  cache: FitCache, PEM results of the same dwell and seed are reused
+##  executor: process pool shared by all calls, used instead of opening a pool of n_workers for each dwell
+def get_params(dwell, n_component=None, n_workers=1, cache=None, seed=None, executor=None):
+    EM_p = EM(dwell, seed=seed, cache=cache)
     if n_component == None:
-        n_components_p = EM_p.opt_components_iter(tolerance=1e-2, mode='PEM', criteria='BIC', figure=False)
+        n_components_p = EM_p.opt_components_iter(tolerance=1e-2, mode='PEM', criteria='BIC', figure=False,
+                                                  n_workers=n_workers, seed=seed, executor=executor)
     else:
         n_components_p = n_component
     f_tau, tau, s_tau, converged_p, ln_likelihood = EM_p.PEM(n_components_p, rand_init=True)
     return EM_p, f_tau, tau, s_tau, converged_p, ln_likelihood
 
+##  fit all dwell sets with the same n_component at once, outputs are (n_sets, n_component) arrays
+##  BatchEM results are not cached, seed for reproducible random initial parameters
+def get_params_batch(dwell_all, n_component, seed=None):
+    EM_p = BatchEM(dwell_all, seed=seed)
+    f_tau, tau, s_tau, converged_p, ln_likelihood = EM_p.PEM(n_component, rand_init=True)
+    return EM_p, f_tau, tau, s_tau, converged_p, ln_likelihood
+
 def collect_params(*args):
     output = []
     for arg in args:
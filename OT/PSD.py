@@ -2,9 +2,10 @@
 from EM_Algorithm.gen_gauss import gen_gauss
 from EM_Algorithm.gen_poisson import gen_poisson
 import matplotlib.pyplot as plt
-from basic.binning import binning, binning2
+from basic.binning import hist_number, hist_width
 import numpy as np
 import math
+from scipy.fft import next_fast_len
 
 class OT_PSD:
     def __init__(self, signal, fs, Fs_spatial=2, F_resolution=0.01, bintype='set_width', bin_number=10):
@@ -15,33 +16,31 @@ class OT_PSD:
         self.t_ACF, self.ACF = self.get_auto_corr(bintype=bintype, bin_number=bin_number)
 
     def get_auto_corr(self, bintype='set_width', bin_number=10, density=False):
-        signal = self.signal
-        F_resolution = self.F_resolution
+        signal = np.asarray(self.signal, dtype=np.float64)
         if bintype == 'set_width':
             Fs_spatial = self.Fs_spatial
-            pd, center, fig, ax = binning2(signal, binwidth=1/Fs_spatial, xlabel='count', show=False, density=density)
+            pd, center, edges = hist_width(signal, binwidth=1/Fs_spatial, density=density)
         else:
-            pd, center, fig, ax = binning(signal, bin_number, xlabel='count', ylabel='probability density', show=False, density=density)
-            Fs_spatial = 1/abs(center[1]-center[0])
+            pd, center, edges = hist_number(signal, bin_number, density=density)
+            Fs_spatial = 1/abs(edges[1]-edges[0])
             self.Fs_spatial = Fs_spatial
 
-        auto_correlation = np.correlate(pd, pd, 'full')
-        # index = np.argmax(auto_correlation)
-        index = int(len(auto_correlation)/2)
-        auto_correlation_R = auto_correlation[index:] ##  picking right hand side
-        t_spatial = np.arange(0, len(auto_correlation_R)) / Fs_spatial
+        ##  ACF by FFT, zero-padded to avoid circular overlap, same as right hand side of np.correlate(pd, pd, 'full')
+        n = len(pd)
+        n_fft = next_fast_len(2*n - 1)
+        pre_ACF = np.fft.rfft(pd, n_fft)
+        auto_correlation_R = np.fft.irfft(pre_ACF.real**2 + pre_ACF.imag**2, n_fft)[:n]
+        t_spatial = np.arange(0, n) / Fs_spatial
         self.auto_correlation = auto_correlation_R
         self.t_ACF = t_spatial
         return t_spatial, auto_correlation_R
 
+    ##  one-sided PSD, freq from 0 to Fs_spatial/2
     def get_PSD(self):
         ACF = self.auto_correlation
         Fs_spatial = self.Fs_spatial
-        pre_psd = np.fft.fft(ACF)
-        psd = abs(pre_psd)
-        freq = np.linspace(0, Fs_spatial, len(ACF))
-        cut = int(len(psd)/2)
-        self.freq = freq[:cut]
-        self.psd = psd[:cut]
+        psd = abs(np.fft.rfft(ACF))
+        freq = np.fft.rfftfreq(len(ACF), d=1/Fs_spatial)
+        self.freq = freq
+        self.psd = psd
         return freq, psd
-
@@ -0,0 +1,80 @@
+### import used modules first
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+### variance of displacement vs time lag for a batch of traces with different fs
+class VarianceAnalysis:
+    def __init__(self, signals, Fs, chunk_size=2**20):
+        if np.ndim(Fs) == 0:
+            Fs = [Fs] * len(signals)
+        self.signals = [np.asarray(signal, dtype=np.float64).ravel() for signal in signals]
+        self.Fs = np.asarray(Fs, dtype=np.float64)
+        self.n_traces = len(self.signals)
+        self.chunk_size = chunk_size ## max number of elements of strided block in memory
+
+    def analyze(self, t):
+        """Variance of displacement for all lags of all traces
+        Parameters
+        ----------
+        t : array
+            time lags (s), the lag of each trace is floor(t*fs) points
+        Returns
+        -------
+        varX : array, (n_traces, len(t)), sample variance of displacement
+        semX : array, (n_traces, len(t)), std of varX up to each lag (nan for the first)
+        xm : array, (n_traces, len(t)), mean displacement
+
+        """
+        t = np.asarray(t, dtype=np.float64)
+        self.t = t
+        varX = np.full((self.n_traces, len(t)), np.nan)
+        xm = np.full((self.n_traces, len(t)), np.nan)
+        for i, (signal, fs) in enumerate(zip(self.signals, self.Fs)):
+            varX[i], xm[i] = self.__get_var_trace(signal, np.floor(t * fs).astype(np.int64))
+        semX = self.__expanding_std(varX)
+        self.varX, self.semX, self.xm = varX, semX, xm
+        return varX, semX, xm
+
+    ##  displacement of lag n: x[j+n]-x[j] for j < (n_row-1)*n, n_row = floor(len/n),
+    ##  same as np.diff of signal reshaped to (n_row, n)
+    def __get_var_trace(self, signal, lags):
+        L = len(signal)
+        valid = (lags > 0) & (lags <= L)
+        n = np.where(valid, lags, 1)
+        m = (L // n - 1) * n ## number of displacements of each lag
+        valid &= m > 1
+        m = np.where(valid, m, 0)
+        varX = np.full(len(lags), np.nan)
+        xm = np.full(len(lags), np.nan)
+        if not np.any(valid):
+            return varX, xm
+        n, m = n[valid], m[valid]
+        ##  sum of displacements by cumulative sum
+        x_cum = np.concatenate(([0], np.cumsum(signal)))
+        sum_1 = x_cum[n + m] - x_cum[n] - x_cum[m]
+        ##  sum of squared displacements, rows of strided view x_pad[j:j+n_max+1] in chunks
+        n_max = np.max(n)
+        x_pad = np.concatenate((signal, np.zeros(n_max)))
+        s = x_pad.strides[0]
+        window = as_strided(x_pad, shape=(L, n_max + 1), strides=(s, s), writeable=False)
+        sum_2 = np.zeros(len(n))
+        n_rows = max(1, self.chunk_size // len(n))
+        for j in range(0, np.max(m), n_rows):
+            block = window[j:j + n_rows]
+            x_diff = block[:, n] - block[:, :1]
+            x_diff[(np.arange(j, j + len(block))[:, None] >= m)] = 0 ## drop displacements out of (n_row-1)*n
+            sum_2 += np.einsum('ij,ij->j', x_diff, x_diff)
+        mean = sum_1 / m
+        varX[valid] = (sum_2 - m * mean**2) / (m - 1)
+        xm[valid] = mean
+        return varX, xm
+
+    ##  std (ddof=1) of varX[:k+1] for each k, along lags
+    def __expanding_std(self, varX):
+        k = np.arange(1, varX.shape[1] + 1)
+        mean = np.cumsum(varX, axis=1) / k
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (np.cumsum(varX**2, axis=1) - k * mean**2) / (k - 1)
+        var[:, 0] = np.nan
+        return np.sqrt(np.clip(var, 0, None))
@@ -1,4 +1,4 @@
-from OT.PSD import OT_PSD
+from OT.bootstrap import bootstrap, PSD_analysis, connect_traces
 from basic.select import select_file
 from basic.filter import MA
 from matplotlib import rcParams
@@ -7,8 +7,6 @@ rcParams["font.sans-serif"] = ["Arial"]
 rcParams.update({'font.size': 18})
 import pandas as pd
 import numpy as np
-import random
-import math
 import matplotlib.pyplot as plt
 # plt.rc('text', usetex=True)
 # plt.rc('font', **{'family' : 'sans-serif'})
@@ -16,19 +14,6 @@ import matplotlib.pyplot as plt
 # plt.rc('legend', fontsize=18)
 
 
-##  generate #n uniform RV range from 0 to max
-def get_uRV(max, n):
-    RVs = np.array([int(math.floor(random.uniform(0, max))) for i in range(n)])
-    return RVs
-
-def get_boot_select(signals):
-    n = len(signals)
-    signals_boot = []
-    index = get_uRV(n, n)
-    for i in index:
-        signals_boot += [list(signals)[i]]
-    return signals_boot
-
 def get_excel_data(data):
     n_traces = int(data.shape[1] / 4)
     signals = []
@@ -44,79 +29,58 @@ def get_excel_data(data):
         Fs += [1 / dt[-1]]
     return signals, Fs
 
-def connect_traces(signals):
-    signal_connect = []
-    L_cum = 0
-    ##  for connecting all traces
-    for fs,signal in zip(Fs,signals):
-        signal_connect = np.append(signal_connect, signal+L_cum)
-        L_cum += np.mean(signal[-20:])
-    return signal_connect
-
-
-### import data
-# path = select_file()
-path = r'C:\Users\pine\Desktop\Data\time trace\m51 all traces\m51_2.0uM_All.xlsx'
-## x:1.8,
-df = pd.read_excel(path)
-data = np.array(df.dropna(axis='columns', how='all'))
-signals, Fs = get_excel_data(data)
-
-
-freq_all_c = []
-psd_all_c = []
-t_AFC_all = []
-AFC_all = []
-n_boot = 2
-for i in range(n_boot):
+if __name__ == '__main__':
+    ### import data
+    # path = select_file()
+    path = r'C:\Users\pine\Desktop\Data\time trace\m51 all traces\m51_2.0uM_All.xlsx'
+    ## x:1.8,
+    df = pd.read_excel(path)
+    data = np.array(df.dropna(axis='columns', how='all'))
+    signals, Fs = get_excel_data(data)
+
+    ### bootstrap traces, resamples run in n_workers processes
+    n_boot = 2
+    n_workers = 1
     Fs_spatial = 5
     F_resolution = 0.002
-
-    signals_boot = get_boot_select(signals)
-    signal_connect = connect_traces(signals_boot)
-
-    PSD_connect = OT_PSD(signal_connect, fs=np.mean(Fs), Fs_spatial=Fs_spatial, F_resolution=F_resolution, bintype='set_width')
-    t_AFC_conn, AFC_conn = PSD_connect.t_ACF, PSD_connect.ACF
-    freq_conn, psd_conn = PSD_connect.get_PSD()
-
-    freq_all_c = np.append(freq_all_c, freq_conn)
-    psd_all_c = np.append(psd_all_c, psd_conn)
-    t_AFC_all += [t_AFC_conn[:200]]
-    AFC_all += [AFC_conn[:200]]
-
-t_AFC = np.mean(np.array(t_AFC_all), axis=0)
-AFC = np.mean(np.array(AFC_all), axis=0)
-
-# fig, ax = plt.subplots(figsize=(10,8))
-# ax.plot(freq_conn, psd_conn, '.')
-# ax.set_xlim(0, Fs_spatial/2)
-# ax.set_ylim(0, psd[np.argsort(psd)[-2]]*2)
-# ax.set_xlabel('spatial frequency (1/count)')
-# ax.set_ylabel('PSD')
-
-fig, ax = plt.subplots(figsize=(10,8))
-ax.plot(t_AFC, AFC, '-.')
-ax.set_xlim(0, 40)
-# ax.set_xlim(0, 100)
-# ax.set_ylim(0.000, 0.1)
-ax.set_xlabel('Distance (count)')
-ax.set_ylabel('Autocorrelation')
-
-fig, ax = plt.subplots(figsize=(10,8))
-f = np.sort(freq_all_c)
-p = psd_all_c[np.argsort(freq_all_c)]
-ax.plot(MA(f,15,mode='silding'), MA(p,15,mode='silding'), '-')
-# ax.plot(f, p, '-')
-ax.set_xlim(0, 0.5)
-# ax.set_xlim(0, 100)
-ax.set_ylim(0.000, 5e7)
-ax.set_xlabel('Spatial frequency (1/count)')
-ax.set_ylabel('Power spectral density(a.u.)')
-ax.annotate(r'$\frac{1}{7.5}$', xy=(1/7.5, 3e7), xytext=(1/7.5, 5e7),
-            arrowprops=dict(facecolor='black', shrink=0.05)
-            )
-
-
-
-plt.figure()
-plt.plot(signal_connect)
\ No newline at end of file
+    boot_results, boot_mean, boot_CI = bootstrap(PSD_analysis, signals, Fs, n_boot=n_boot, n_workers=n_workers, seed=0,
+                                                 Fs_spatial=Fs_spatial, F_resolution=F_resolution, bintype='set_width')
+    t_AFC = boot_mean['t_ACF']
+    AFC = boot_mean['ACF']
+    signal_connect = connect_traces(signals)
+
+    # fig, ax = plt.subplots(figsize=(10,8))
+    # ax.plot(freq_conn, psd_conn, '.')
+    # ax.set_xlim(0, Fs_spatial/2)
+    # ax.set_ylim(0, psd[np.argsort(psd)[-2]]*2)
+    # ax.set_xlabel('spatial frequency (1/count)')
+    # ax.set_ylabel('PSD')
+
+    fig, ax = plt.subplots(figsize=(10,8))
+    ax.plot(t_AFC, AFC, '-.')
+    ax.fill_between(t_AFC, boot_CI['ACF'][0], boot_CI['ACF'][1], alpha=0.3)
+    ax.set_xlim(0, 40)
+    # ax.set_xlim(0, 100)
+    # ax.set_ylim(0.000, 0.1)
+    ax.set_xlabel('Distance (count)')
+    ax.set_ylabel('Autocorrelation')
+
+    fig, ax = plt.subplots(figsize=(10,8))
+    f = boot_mean['freq']
+    p = boot_mean['psd']
+    ax.plot(MA(f,15,mode='silding'), MA(p,15,mode='silding'), '-')
+    ax.fill_between(f, boot_CI['psd'][0], boot_CI['psd'][1], alpha=0.3)
+    # ax.plot(f, p, '-')
+    ax.set_xlim(0, 0.5)
+    # ax.set_xlim(0, 100)
+    ax.set_ylim(0.000, 5e7)
+    ax.set_xlabel('Spatial frequency (1/count)')
+    ax.set_ylabel('Power spectral density(a.u.)')
+    ax.annotate(r'$\frac{1}{7.5}$', xy=(1/7.5, 3e7), xytext=(1/7.5, 5e7),
+                arrowprops=dict(facecolor='black', shrink=0.05)
+                )
+
+
+
+    plt.figure()
+    plt.plot(signal_connect)
@@ -8,6 +8,7 @@ from FRET.cluster_FRET import get_col, gen_random_code
 import scipy.io as sio
 import pandas as pd
 from EM_Algorithm.EM import *
+from EM_Algorithm.cache import FitCache
 import matplotlib.pyplot as plt
 
 def remove_steps(step, dwell, criteria):
@@ -15,6 +16,7 @@ def remove_steps(step, dwell, criteria):
     return step[booleans], dwell[booleans]
 
 if __name__ == '__main__':
+    cache = FitCache() ## reuse EM results of unchanged data
     all_gauss = []
     all_survival = []
     all_results = []
@@ -55,14 +57,14 @@ if __name__ == '__main__':
             # all_gauss += [np.array([f, m, s, converged_g]).T]
     
             ## get poisson EM results
-            EM_p = EM(dwell)
+            EM_p = EM(dwell, seed=0, cache=cache)
             # n_components_p = EM_p.opt_components_iter(tolerance=1e-2, mode='PEM', criteria='BIC', figure=False)
             f_tau, tau, s_tau, converged_p, LLE = EM_p.PEM(2)
             # all_survival += [np.array([f_tau, tau, converged_p]).T]
 
             ##  2D clustering
             step_dwell = np.array([step, dwell]).T
-            EM_gp = EM(step_dwell, dim=2)
+            EM_gp = EM(step_dwell, dim=2, seed=0, cache=cache)
             # opt_components = EM_gp.opt_components_iter(tolerance=1e-2, mode='GPEM', criteria='BIC', figure=False)
             f1, m1, s1, tau1, converged_gp, LLE_gp = EM_gp.GPEM(n_components=2, tolerance=1e-2, rand_init=True)
 
@@ -0,0 +1,105 @@
+### import used modules first
+from OT.PSD import OT_PSD
+from OT.VA import VarianceAnalysis
+from EM_Algorithm.EM import EM
+from basic.fitting import L_fit
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+
+###  process-pool workers for bootstrap, each process keeps the analysis function and the data
+_boot_worker = None
+
+def _init_boot_worker(analysis, data, kwargs):
+    global _boot_worker
+    _boot_worker = (analysis, data, kwargs)
+
+def _boot_worker_run(index):
+    analysis, data, kwargs = _boot_worker
+    return run_analysis(analysis, data, index, kwargs)
+
+
+##  (n_boot, n) index matrix of resamples with replacement, from a seeded Generator
+def get_boot_index(n, n_boot, seed=None):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, n, size=(n_boot, n))
+
+##  select items of array or list by index
+def select_index(data, index):
+    if isinstance(data, np.ndarray):
+        return data[index]
+    return [data[i] for i in index]
+
+def run_analysis(analysis, data, index, kwargs):
+    return analysis(*[select_index(x, index) for x in data], **kwargs)
+
+def bootstrap(analysis, *data, n_boot=1000, n_workers=1, seed=None, alpha=0.05, **kwargs):
+    """Bootstrap any analysis by resampling items (traces or samples) with replacement
+    Parameters
+    ----------
+    analysis : function
+        analysis(*data_resampled, **kwargs) returns dictionary of arrays (or numbers) with fixed shape,
+        must be a module-level function if n_workers > 1
+    data : list or array
+        one or more sequences of same length, resampled with the same index, e.g. signals, Fs
+    n_boot : int
+        number of resamples
+    n_workers : int
+        n_workers > 1: resamples run in a process pool
+    Returns
+    -------
+    boot_results : dictionary of arrays, (n_boot, ...)
+    boot_mean : dictionary of arrays, mean of resamples
+    boot_CI : dictionary of arrays, (2, ...), lower and upper percentile of (1 - alpha) CI
+
+    """
+    index = get_boot_index(len(data[0]), n_boot, seed=seed)
+    if n_workers == 1:
+        results = [run_analysis(analysis, data, i, kwargs) for i in index]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_boot_worker,
+                                 initargs=(analysis, data, kwargs)) as executor:
+            results = list(executor.map(_boot_worker_run, index, chunksize=max(1, n_boot // (4 * n_workers))))
+    boot_results = {key: np.array([result[key] for result in results]) for key in results[0]}
+    boot_mean, boot_CI = get_mean_CI(boot_results, alpha=alpha)
+    return boot_results, boot_mean, boot_CI
+
+##  mean and percentile CI of each entry of boot_results
+def get_mean_CI(boot_results, alpha=0.05):
+    boot_mean = dict()
+    boot_CI = dict()
+    for key, value in boot_results.items():
+        boot_mean[key] = np.nanmean(value, axis=0)
+        boot_CI[key] = np.nanpercentile(value, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+    return boot_mean, boot_CI
+
+
+### analysis functions for bootstrap
+
+##  connect traces, each trace is shifted by the end (mean of last 20 points) of previous traces
+def connect_traces(signals):
+    L_cum = np.cumsum([0] + [np.mean(signal[-20:]) for signal in signals[:-1]])
+    return np.concatenate([signal + L for signal, L in zip(signals, L_cum)])
+
+##  ACF and PSD of connected traces, PSD is interpolated to freq_grid so all resamples have same shape
+def PSD_analysis(signals, Fs, Fs_spatial=5, F_resolution=0.002, bintype='set_width', n_ACF=200, n_freq=500):
+    signal_connect = connect_traces(signals)
+    PSD = OT_PSD(signal_connect, fs=np.mean(Fs), Fs_spatial=Fs_spatial, F_resolution=F_resolution, bintype=bintype)
+    PSD.get_PSD()
+    freq_grid = np.linspace(0, Fs_spatial / 2, n_freq)
+    ACF = np.full(n_ACF, np.nan)
+    ACF[:min(n_ACF, len(PSD.ACF))] = PSD.ACF[:n_ACF]
+    return {'t_ACF': np.arange(n_ACF) / PSD.Fs_spatial, 'ACF': ACF,
+            'freq': freq_grid, 'psd': np.interp(freq_grid, PSD.freq, PSD.psd)}
+
+##  mean variance of displacement over all traces for each t, and slope of linear fit of first points_tofit
+def variance_slope_analysis(signals, Fs, t, points_tofit=16):
+    varX_all, semX_all, xm_all = VarianceAnalysis(signals, Fs).analyze(t)
+    varX = np.mean(varX_all, axis=0)
+    slope, intercept = L_fit(t[:points_tofit], varX[:points_tofit])
+    return {'varX': varX, 'slope': slope, 'intercept': intercept}
+
+##  Poisson EM of dwell times
+def PEM_analysis(dwell, n_components=2, tolerance=1e-2):
+    f, tau, s, converged, ln_likelihood = EM(dwell).PEM(n_components, tolerance=tolerance)
+    return {'f': f, 'tau': tau, 'LLE': ln_likelihood[0]}
@@ -1,39 +1,13 @@
 from OT.PSD import OT_PSD
+from OT.VA import VarianceAnalysis
 from OT.gen_Poisson_step import gen_Poi_step, gen_Poi_2step
 from basic.fitting import linear_eq, L_fit
 
 import matplotlib.pyplot as plt
 import numpy as np
 import random
-import statistics as stat
 from basic.filter import MA
 
-class VA:
-    def __init__(self, signal, fs, t_end=1):
-        self.signal = signal
-        self.fs = fs
-        self.t_end = t_end
-
-    def analyze(self):
-        signal = self.signal
-        fs = self.fs
-        t_end = self.t_end
-        varX, semX, xm = [], [], []
-        ### calculate variance
-        t = np.arange(0.05, (t_end - 0.05) / 2, 2/fs)
-        for ti in t:
-            n_interval = int(np.floor(ti * fs))  ## time diff for calculating variance
-            n_row = int(np.floor(len(signal) / n_interval))  ##
-            n_samples = n_interval * n_row
-            x = signal[0:n_samples]
-            x_reshape = x.reshape(n_row, n_interval)
-            x_diff = np.diff(x_reshape, axis=0).ravel()
-            varX += [stat.variance(x_diff)]  ## sample variance
-            semX += [np.std(varX, ddof=1)]
-            xm += [np.mean(x_diff)]
-        return t, varX, semX
-
-
 stepsize = np.array([5, 10])
 tau = np.array([1, 2])
 fs = 100 ## Sampling frequency (Hz)
@@ -49,8 +23,10 @@ ax.set_ylabel('Signal (a.u.)', fontsize=22)
 ax.set_xlim(0,10)
 ax.set_ylim(0,100)
 
-VA_test = VA(signal_connect, fs, t_end=2)
-time, varX, semX = VA_test.analyze()
+t_end = 2
+time = np.arange(0.05, (t_end - 0.05) / 2, 2/fs)
+VA_test = VarianceAnalysis([signal_connect], fs)
+varX, semX, xm = [x[0] for x in VA_test.analyze(time)]
 slope, intercept = L_fit(time, varX)
 slope_e = np.sum(stepsize**2/tau*n_events/sum(n_events))
 
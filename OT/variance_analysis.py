@@ -5,10 +5,10 @@ rcParams.update({'font.size': 18})
 import pandas as pd
 from basic.select import select_file
 import numpy as np
-import statistics as stat
 import matplotlib.pyplot as plt
 from basic.fitting import linear_eq, L_fit
 from basic.file_io import save_img
+from OT.VA import VarianceAnalysis
 
 ### import data
 # path = select_file()
@@ -30,32 +30,13 @@ for i in range(n_traces):
 
 ### calculate variance
 t = np.arange(0.05, (min(t_end)-0.05)/2, 0.01)
-varX_all = []
-semX_all = []
+VA = VarianceAnalysis(signals, Fs)
+varX_all, semX_all, xm_all = VA.analyze(t)
 velocity_all = []
-xm_all = []
 for i,signal in enumerate(signals):
-    print(f'analyzing variance of trace #{i}')
-    fs = Fs[i]
-    varX = []
-    semX = []
-    xm = []
-    t_trace = np.arange(0, len(signal)) / fs
+    t_trace = np.arange(0, len(signal)) / Fs[i]
     v, x0 = L_fit(t_trace, signal)
-    for ti in t:
-        n_interval = int(np.floor(ti*fs)) ## time diff for calculating variance
-        n_row = int(np.floor(len(signal)/n_interval)) ##
-        n_samples = n_interval*n_row
-        x = signal[0:n_samples]
-        x_reshape = x.reshape(n_row, n_interval)
-        x_diff = np.diff(x_reshape, axis=0).ravel()
-        varX += [stat.variance(x_diff)] ## sample variance
-        semX += [np.std(varX, ddof=1)]
-        xm += [np.mean(x_diff)]
-    varX_all += [np.array(varX)]
-    semX_all += [np.array(semX)]
     velocity_all += [v]
-    xm_all += [np.array(xm)]
 
 ### fit all time vs variance(t)
 slope_all = []
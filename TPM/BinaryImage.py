@@ -3,7 +3,6 @@ import scipy.optimize as opt
 import math
 from sys import platform
 import ctypes
-import struct
 import numpy as np
 from pathlib import Path
 import matplotlib.pyplot as plt
@@ -16,6 +15,9 @@ import pandas as pd
 import io
 import random
 import string
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from TPM.batch_fitting import LM_fit_batch, moment_batch, radial_batch, twoD_Gaussian_batch
 
 
 ###  2-D Gaussian function with rotation angle
@@ -32,6 +34,22 @@ def twoD_Gaussian(xy, amplitude, sigma_x, sigma_y, xo, yo, theta_deg, offset):
                                        + c * ((y - yo) ** 2)))
     return g.ravel()
 
+###  process-pool workers for Track_All_Frames, each process keeps one BinaryImage
+_glimpse_worker = None
+
+def _init_tracking_worker(glimpse_data):
+    global _glimpse_worker
+    _glimpse_worker = glimpse_data
+
+def _track_frames_worker(args):
+    frame_i, N, cX, cY, initial_guess_beads, IC, fit_mode, warm_start = args
+    return _glimpse_worker.track_frames(frame_i, N, cX, cY, initial_guess_beads, IC=IC, fit_mode=fit_mode,
+                                        warm_start=warm_start)
+
+###  default progress callback of Track_All_Frames
+def print_progress(n_done, n_total):
+    print(f'frame {n_done}/{n_total}')
+
 ### define a class for all glimpse data
 class BinaryImage:
     def __init__(self, path_folder, read_mode=1, frame_setread_num=20, frame_start=0,
@@ -46,6 +64,7 @@ class BinaryImage:
         self.path_data = self.__get_path_data()
         [self.frames_acquired, self.height, self.width, self.pixeldepth, self.med_fps] = self.getheader()
         self.data_type, self.size_a_image, self.frame_per_file = self.__getdatainfo()
+        self.memmap = self.__get_memmap()
         self.read_mode = read_mode
         self.frame_setread_num = frame_setread_num
         self.criteria_dist = criteria_dist
@@ -68,6 +87,19 @@ class BinaryImage:
         self.initial_guess = [50., 2., 2., aoi_size/2, aoi_size/2, 0., self.background]
         self.image_cut = []
 
+    ##  memory-mapped files are not pickled, re-map them when sent to another process
+    ##  results of earlier runs (tracking_results can be a whole on-disk array) and figures are not sent either
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ['memmap', 'readN', 'tracking_results', 'image_cut', 'ax', 'image_aoi']:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.image_cut = []
+        self.memmap = self.__get_memmap()
+        self.readN = self.__readGlimpseN(self.frame_read_forcenter, self.N_loc)
 
     ###########################################################################
     ##  main for localization
@@ -97,14 +129,20 @@ class BinaryImage:
         return bead_radius, random_string
 
     ##  main for tracking all frames and all beads(cX, cY)
-    def Track_All_Frames(self, selected_aoi=None, IC=False):
-
+    ##  fit_mode: 'curve_fit' fits each bead by scipy, 'LM' fits all beads of a frame together (batch_fitting),
+    ##            'moment' uses centroid and second moments, 'radial' uses radial-symmetry center and second moments
+    ##  n_workers > 1: frames are split into chunks of chunk_size and tracked in a process pool
+    ##  warm_start: None fits each frame from argmax guess, 'last' from the last fitted parameters,
+    ##              'average' from running average of fitted parameters
+    ##  path_results: if given, results are written into a column-major .npy file instead of memory
+    ##  callback: called as callback(n_frames_done, N) after each chunk
+    def Track_All_Frames(self, selected_aoi=None, IC=False, fit_mode='curve_fit', n_workers=1, chunk_size=100,
+                         warm_start=None, path_results=None, callback=print_progress):
+
+        self.__check_warm_start(warm_start)
         frames_acquired = self.frames_acquired
-        frame_start = self.frame_start
-        aoi_size = self.aoi_size
         read_mode = self.read_mode
         frame_setread_num = self.frame_setread_num
-        frame_read_forcenter = self.frame_read_forcenter
         initial_guess, initial_guess_beads, N = self.__preparefit_info(read_mode, frame_setread_num, frames_acquired)
         if selected_aoi == None:
             cX = self.cX
@@ -115,21 +153,84 @@ class BinaryImage:
             initial_guess_beads = np.array(initial_guess_beads[selected_aoi], ndmin=2)
 
         p0_1 = initial_guess_beads  # initialize fitting parameters for each bead
-        tracking_results_list = []
-
-        for i in range(N):
-            image = self.__readGlimpse1(frame_start+i)
-            data, p0_2 = self.trackbead(image, cX, cY, aoi_size, frame=i, initial_guess_beads=p0_1,IC=IC)
-            # p0_1 = self.__update_p0(p0_1, p0_2, i)  # update fitting initial guess
-            tracking_results_list += data
-            print(f'frame {i}')
+        bead_number = len(cX)
+        tracking_results = self.__preallocate_results(N * bead_number, path_results)
+        chunks = [(frame_i, min(chunk_size, N - frame_i)) for frame_i in range(0, N, chunk_size)]
+        if n_workers == 1:
+            results = (self.track_frames(frame_i, n, cX, cY, p0_1, IC=IC, fit_mode=fit_mode, warm_start=warm_start)
+                       for frame_i, n in chunks)
+            p0_1 = self.__write_results(tracking_results, chunks, results, bead_number, N, callback, p0_1)
+        else:
+            ##  each worker gets its own copy of self, glimpse files are re-mapped after unpickling
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_tracking_worker,
+                                     initargs=(self,)) as executor:
+                args = ((frame_i, n, cX, cY, p0_1, IC, fit_mode, warm_start) for frame_i, n in chunks)
+                results = self.__iter_ordered(executor, args, max_pending=2 * n_workers)
+                p0_1 = self.__write_results(tracking_results, chunks, results, bead_number, N, callback, p0_1)
+        if path_results is not None:
+            tracking_results.flush()
         self.N = N
         self.initial_guess_beads = p0_1
-        tracking_results = np.array(tracking_results_list)
         self.tracking_results = tracking_results
         self.aoi = [cX, cY]
         return tracking_results
 
+    ##  tracking N frames from frame_i (relative to frame_start), output: (N*bead_number, 12) array, popt of last frame
+    def track_frames(self, frame_i, N, cX, cY, initial_guess_beads, IC=False, fit_mode='curve_fit', warm_start=None):
+        self.__check_warm_start(warm_start)
+        aoi_size = self.aoi_size
+        bead_number = len(cX)
+        p0_1 = np.array(initial_guess_beads)
+        p0_2 = np.array(initial_guess_beads)
+        ss_res_last = None  # the first frame of each chunk starts from argmax guess
+        tracking_results = np.zeros((N * bead_number, 12))
+        for n, (i, image) in enumerate(self.__iter_frames(frame_i, N)):
+            if fit_mode == 'curve_fit':
+                data, p0_2 = self.trackbead(image, cX, cY, aoi_size, frame=i, initial_guess_beads=np.array(p0_1),
+                                            IC=IC, warm_start=warm_start, ss_res_last=ss_res_last)
+            else:
+                data, p0_2 = self.trackbead_batch(image, cX, cY, aoi_size, frame=i, IC=IC, fit_mode=fit_mode,
+                                                  initial_guess_beads=p0_1, warm_start=warm_start,
+                                                  ss_res_last=ss_res_last)
+            if warm_start == 'average':
+                p0_1 = self.__update_p0(p0_1, p0_2, n)  # update fitting initial guess
+            else:
+                p0_1 = p0_2
+            tracking_results[n * bead_number:(n + 1) * bead_number] = data
+            ss_res_last = tracking_results[n * bead_number:(n + 1) * bead_number, 11]
+        return tracking_results, p0_2
+
+    ##  reader generator, yield (frame, image) of N frames from frame_i (relative to frame_start)
+    def __iter_frames(self, frame_i, N):
+        frame_start = self.frame_start
+        for i in range(frame_i, frame_i + N):
+            yield i, self.__readGlimpse1(frame_start + i)
+
+    ##  preallocate (n_rows, 12) results in memory, or in a column-major .npy file if path is given
+    def __preallocate_results(self, n_rows, path_results=None):
+        if path_results is None:
+            return np.zeros((n_rows, 12))
+        return np.lib.format.open_memmap(path_results, mode='w+', dtype=float, shape=(n_rows, 12),
+                                         fortran_order=True)
+
+    ##  writer, copy results of each chunk into tracking_results and report progress, return popt of last frame
+    def __write_results(self, tracking_results, chunks, results, bead_number, N, callback, p0):
+        for (frame_i, n), (data, p0) in zip(chunks, results):
+            tracking_results[frame_i * bead_number:(frame_i + n) * bead_number] = data
+            if callback is not None:
+                callback(frame_i + n, N)
+        return p0
+
+    ##  submit tasks to executor and yield results in order, at most max_pending results are held in memory
+    def __iter_ordered(self, executor, args, max_pending):
+        pending = deque()
+        for arg in args:
+            pending.append(executor.submit(_track_frames_worker, arg))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
     ##  main for getting fit-video of an aoi
     def Get_fitting_video_offline(self, selected_aoi, frame_i, N):
         tracking_results = self.tracking_results
@@ -180,7 +281,11 @@ class BinaryImage:
         return cX, cY, amplitude
 
     ##  tracking position of all beads in a image, get all parameters and frame number
-    def trackbead(self, image, cX, cY, aoi_size, frame, initial_guess_beads, IC=False):
+    ##  warm_start: fit from initial_guess_beads first, refit from argmax guess if it fails or
+    ##              its residual > residual_ratio * residual of last frame(ss_res_last)
+    def trackbead(self, image, cX, cY, aoi_size, frame, initial_guess_beads, IC=False,
+                  warm_start=None, ss_res_last=None, residual_ratio=2.):
+        self.__check_warm_start(warm_start)
         bead_number = len(cX)
         bounds = self.__get_bounds(aoi_size)
         x, y = self.x_fit, self.y_fit
@@ -190,9 +295,16 @@ class BinaryImage:
             initial_guess = self.__get_guess(image_tofit)
 
             if IC==True:
-                contrast = 8
-                image_tofit = ImageEnhance.Contrast(Image.fromarray(image_tofit.astype('uint8'))).enhance(contrast)
-                image_tofit = np.array(image_tofit)
+                image_tofit = self.__enhance_aoi(image_tofit)
+            if warm_start != None and ss_res_last is not None and ss_res_last[j] > 0:
+                fit_warm = self.__fit_warm(x, y, image_tofit, initial_guess_beads[j, :], bounds,
+                                           residual_ratio * ss_res_last[j])
+                if fit_warm is not None:
+                    popt, ss_res = fit_warm
+                    intensity_integral = 2 * math.pi * popt[0] * popt[1] * popt[2]
+                    data += [[frame] + [j] + list(popt) + [intensity] + [intensity_integral] + [ss_res]]
+                    initial_guess_beads[j, :] = popt
+                    continue
             try:
                 # popt, pcov = opt.curve_fit(twoD_Gaussian, [x, y], image_tofit.ravel(), initial_guess_beads[j, :],
                 #                            bounds=bounds)
@@ -218,6 +330,62 @@ class BinaryImage:
         popt_beads = np.array(initial_guess_beads)
         return data, popt_beads
 
+    ##  fit an AOI from last parameters, return None if fitting fails or ss_res > ss_res_max
+    def __fit_warm(self, x, y, image_tofit, p0, bounds, ss_res_max):
+        p0 = np.clip(p0, bounds[0], bounds[1])
+        try:
+            popt, pcov = opt.curve_fit(twoD_Gaussian, [x, y], image_tofit.ravel(), p0,
+                                       bounds=bounds, method='trf')
+        except:
+            return None
+        ss_res = self.__get_residuals(twoD_Gaussian, x, y, image_tofit, popt)
+        if ss_res > ss_res_max:
+            return None
+        return popt, ss_res
+
+    def __check_warm_start(self, warm_start):
+        if warm_start not in (None, 'last', 'average'):
+            raise ValueError(f"warm_start must be None, 'last' or 'average', got {warm_start!r}")
+
+    ##  tracking all beads in a image together, same output as trackbead
+    ##  fit_mode: 'LM' (batch Levenberg-Marquardt), 'moment' or 'radial' (no fitting)
+    ##  warm_start: for 'LM', same as trackbead
+    def trackbead_batch(self, image, cX, cY, aoi_size, frame, IC=False, fit_mode='LM',
+                        initial_guess_beads=None, warm_start=None, ss_res_last=None, residual_ratio=2.):
+        self.__check_warm_start(warm_start)
+        bounds = self.__get_bounds(aoi_size)
+        x, y = self.x_fit, self.y_fit
+        images_tofit, intensity = self.__getAOI_stack(image, cY, cX, aoi_size)
+        initial_guess = self.__get_guess_batch(images_tofit)
+        if IC==True:
+            images_tofit = np.array([self.__enhance_aoi(image_tofit) for image_tofit in images_tofit])
+        if fit_mode == 'LM':
+            warm = np.zeros(len(cX), dtype=bool)
+            if warm_start != None and ss_res_last is not None:
+                warm = ss_res_last > 0
+            p0 = np.where(warm[:, None], initial_guess_beads, initial_guess)
+            popt, ss_res, success = LM_fit_batch([x, y], images_tofit, p0, bounds)
+            ##  fall back to argmax guess if fitting from last parameters fails or diverges
+            refit = warm & (~success | (ss_res > residual_ratio * np.where(warm, ss_res_last, 0)))
+            if any(refit):
+                popt[refit], ss_res[refit], success[refit] = LM_fit_batch([x, y], images_tofit[refit],
+                                                                          initial_guess[refit], bounds)
+        else:
+            if fit_mode == 'moment':
+                popt = moment_batch(images_tofit)
+            else:
+                popt = radial_batch(images_tofit)
+            residuals = images_tofit.reshape(len(popt), -1) - twoD_Gaussian_batch([x, y], popt)
+            ss_res = np.sum(residuals ** 2, axis=1)
+            success = np.all(np.isfinite(popt), axis=1) & np.isfinite(ss_res)
+        intensity_integral = 2 * math.pi * popt[:, 0] * popt[:, 1] * popt[:, 2]
+        bead_number = len(cX)
+        data = np.column_stack([np.full(bead_number, frame), np.arange(bead_number), popt,
+                                intensity, intensity_integral, ss_res])
+        data[~success, 2:] = 0.
+        popt[~success] = initial_guess[~success]
+        return data, popt
+
     ### methods for localization
 
 
@@ -426,6 +594,21 @@ class BinaryImage:
         intensity = np.sum(image_cut)
         return image_cut, intensity
 
+    ## get image-cut of all AOIs, output: (n_aoi, aoi_size, aoi_size)
+    def __getAOI_stack(self, image, row, col, aoi_size=20):
+        size_half = int(aoi_size / 2)
+        row = np.array(row).astype(int) - size_half  # cY, height
+        col = np.array(col).astype(int) - size_half  # cX, width
+        index = np.arange(2 * size_half)
+        images_cut = image[(row[:, None] + index)[:, :, None], (col[:, None] + index)[:, None, :]]
+        intensity = np.sum(images_cut, axis=(1, 2))
+        return images_cut, intensity
+
+    ## enhance contrast of an AOI
+    def __enhance_aoi(self, image_tofit, contrast=8):
+        image_tofit = ImageEnhance.Contrast(Image.fromarray(image_tofit.astype('uint8'))).enhance(contrast)
+        return np.array(image_tofit)
+
     ## get sum of squared residuals
     def __get_residuals(self, fn, x, y, image, popt):
         residuals = image.ravel() - fn((x, y), *popt)
@@ -463,38 +646,61 @@ class BinaryImage:
         initial_guess = [amp_guess, 2.5, 2.5, x_guess, y_guess, 0, background]
         return initial_guess
 
+    ##  get initial guess of all AOIs, images_tofit: (n_aoi, aoi_size, aoi_size)
+    def __get_guess_batch(self, images_tofit):
+        aoi_size = self.aoi_size
+        background = self.background
+        n_aoi = len(images_tofit)
+        index_max = np.argmax(images_tofit.reshape(n_aoi, -1), axis=1)
+        amp_guess = np.max(images_tofit, axis=(1, 2)) - background
+        initial_guess = np.column_stack([amp_guess, np.full(n_aoi, 2.5), np.full(n_aoi, 2.5),
+                                         index_max % aoi_size, index_max // aoi_size,
+                                         np.zeros(n_aoi), np.full(n_aoi, background)])
+        return initial_guess
+
     ###############################################################################
     ### methods for image reading
-    ##  read one image at frame_i (0,1,2,...,N-1)
+    ##  read one image at frame_i (0,1,2,...,N-1), return a view of memory-mapped file without copying
     def __readGlimpse1(self, frame_i=0):
         fileNumber = self.fileNumber[frame_i]
-        offset = self.offset[frame_i]
-        size_a_image = self.size_a_image
-        data_type = self.data_type
-        height = self.height
-        width = self.width
-        with open(self.path_data[fileNumber], 'rb') as f:
-            f.seek(offset)
-            data = f.read(size_a_image)
-            decoded_data = struct.unpack('>' + str(size_a_image * 1) + data_type, data)
-            read1 = np.reshape(decoded_data, (height, width))
-            # self.image = self.read1
+        read1 = self.memmap[fileNumber][self.__get_frame_in_file(frame_i)]
         return read1
 
-    ##  read N image from frame_i (0,1,2,...,N-1)
+    ##  read N image from frame_i (0,1,2,...,N-1), only copy when frames are across files
     def __readGlimpseN(self, frame_i=0, N=50):
-        fileNumber = self.fileNumber[frame_i: frame_i + N]
-        offset_toread = [self.offset[x] for x in set(fileNumber)]
-        path_toread = [self.path_data[x] for x in set(fileNumber)]
-        frame_toread = [sum(fileNumber == x) for x in set(fileNumber)]
-        decoded_data = []
-        for path, frame, offset in zip(path_toread, frame_toread, offset_toread):
-            with open(path, 'rb') as f:
-                f.seek(offset)
-                data = f.read(self.size_a_image * frame)
-                decoded_data += struct.unpack('>' + str(self.size_a_image * frame) + self.data_type, data)
-        readN = np.reshape(decoded_data, (N, self.height, self.width))
-        return readN
+        frames = np.arange(frame_i, frame_i + N)
+        fileNumber = np.array(self.fileNumber[frame_i: frame_i + N])
+        readN = []
+        for x in np.unique(fileNumber):
+            frames_in_file = self.__get_frame_in_file(frames[fileNumber == x])
+            readN += [self.memmap[x][frames_in_file[0]:frames_in_file[-1] + 1]]
+        if len(readN) == 1:
+            return readN[0]
+        return np.concatenate(readN, axis=0)
+
+    ##  get frame index inside its own .glimpse file from offset array
+    def __get_frame_in_file(self, frame_i):
+        return self.offset[frame_i] // (self.height * self.width)
+
+    ##  map each .glimpse file as (frames, height, width) array, (big-endian, read-only)
+    def __get_memmap(self):
+        height = self.height
+        width = self.width
+        dtype = self.__get_dtype()
+        memmap = []
+        for path, frame in zip(self.path_data, self.frame_per_file):
+            if frame == 0:
+                memmap += [np.empty((0, height, width), dtype=dtype)]
+            else:
+                memmap += [np.memmap(path, dtype=dtype, mode='r', shape=(frame, height, width))]
+        return memmap
+
+    ##  get numpy dtype of glimpse data, 'B': 8 bit unsigned, 'h': 16 bit signed
+    def __get_dtype(self):
+        if self.data_type == 'B':
+            return np.dtype('>u1')
+        else:
+            return np.dtype('>i2')
 
     ###############################################################################
     ### methods for getting header information
@@ -589,7 +795,7 @@ class BinaryImage:
             else:
                 a = 0
                 b += 1
-        return offset, fileNumber
+        return np.array(offset), np.array(fileNumber)
     ###############################################################################
 
 
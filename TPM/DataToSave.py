@@ -7,6 +7,8 @@ import numpy as np
 import os
 import datetime
 import pandas as pd
+import h5py
+from glob import glob
 
 ### Use for data saving and data reshaping
 class DataToSave:
@@ -43,6 +45,45 @@ class DataToSave:
         self.save_selected_dict_df_to_excel()
         self.save_removed_dict_df_to_excel()
 
+    ##  save fitresults, all reshaped and analyzed sheets and selection criteria to a HDF5 file
+    ##  each column or sheet is a chunked, gzip-compressed dataset, reload by load_hdf5(path)
+    def save_to_hdf5(self, title=''):
+        random_string = self.random_string
+        df = self.df
+        df_reshape_analyzed = self.df_reshape_analyzed
+        path_folder = self.path_folder
+        filename_time = self.filename_time
+        sheet_names = self.sheet_names
+        path = os.path.join(path_folder, f'{filename_time}-{random_string}{title}-fitresults.h5')
+        with h5py.File(path, 'w') as f:
+            group = f.create_group('fitresults')
+            group.attrs['columns'] = _str_array(df.columns)
+            for column in df.columns:
+                group.create_dataset(column, data=np.array(df[column]), chunks=True, compression='gzip')
+            group = f.create_group('sheets')
+            group.attrs['sheet_names'] = _str_array(sheet_names)
+            for sheet_name in sheet_names:
+                self.__save_df_to_hdf5(group, sheet_name, df_reshape_analyzed[sheet_name])
+            f.create_dataset('criteria', data=self.get_criteria(df_reshape_analyzed))
+            f.attrs['med_fps'] = self.med_fps
+            f.attrs['frame_start'] = self.frame_start
+            f.attrs['BM_lower'] = self.BM_lower
+            f.attrs['BM_upper'] = self.BM_upper
+        return path
+
+    ##  save a DataFrame as 2D dataset, string labels (bead names) are saved as attribute, numeric labels as dataset
+    def __save_df_to_hdf5(self, group, name, df):
+        dataset = group.create_dataset(name, data=np.array(df, dtype=float), chunks=True, compression='gzip')
+        if df.columns.dtype == object:
+            dataset.attrs['columns'] = _str_array(df.columns)
+        else:
+            group.create_dataset(f'{name}_columns', data=np.array(df.columns))
+        dataset.attrs['index_name'] = str(df.index.name)
+        if df.index.dtype == object:
+            dataset.attrs['index'] = _str_array(df.index)
+        else:
+            group.create_dataset(f'{name}_index', data=np.array(df.index), chunks=True, compression='gzip')
+
     ##  save fitresults to csv
     def save_fitresults_to_csv(self):
         random_string = self.random_string
@@ -206,41 +247,36 @@ class DataToSave:
         return np.array(time_sliding), np.array(time_fixing)
 
 
-    ### data:1D numpy array for a bead, BM: 1D numpy array
-    def __calBM_1D(self, data, window=20, factor_p2n=10000/180, method='sliding'):
-        time = self.time
-        if method == 'sliding':  # overlapping
-            iteration = len(data) - window + 1  # silding window
-            BM_s = []
-            for i in range(iteration):
-                data_pre = data[i: i + window]
-                try:
-                    BM_s += [factor_p2n * np.std(data_pre[data_pre > 0], ddof=1)]
-                except:
-                    BM_s += [0]
-            BM = BM_s
-        else:  # fix, non-overlapping
-            iteration = int(len(data) / window)  # fix window
-            BM_f = []
-            for i in range(iteration):
-                data_pre = data[i * window: (i + 1) * window]
-                try:
-                    BM_f += [factor_p2n * np.std(data_pre[data_pre > 0], ddof=1)]
-                except:
-                    BM_f += [0]
-            BM = BM_f
-        return np.array(BM)
+    ### std (ddof=1) of positive values in each window for all beads, data_2D: (row, col)=(frames, beads)
+    ### n, s, ss: window sums of counts, values and squared values, output nan if count < 2 (same as np.std)
+    def __get_window_std(self, n, s, ss):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = (ss - s**2 / n) / (n - 1)
+        var[n < 2] = np.nan
+        return np.sqrt(np.clip(var, 0, None))
 
     ##  cal BM of multiple beads, data_2D: (row, col)=(frames, beads)
+    ##  only positive values in each window are used, window sums are from cumulative sums(sliding) or reshape(fixing)
     def calBM_2D(self, data_2D, window=20, factor_p2n=10000/180):
-        ##  get BM of each beads
-        BM_sliding = []
-        BM_fixing = []
-        for data_1D in data_2D.T:
-            BM_sliding += [self.__calBM_1D(data_1D, window=window, factor_p2n=factor_p2n, method='sliding')]
-            BM_fixing += [self.__calBM_1D(data_1D, window=window, factor_p2n=factor_p2n, method='fixing')]
-        BM_sliding = np.array(BM_sliding).T
-        BM_fixing = np.array(BM_fixing).T
+        data_2D = np.array(data_2D, dtype=float)
+        mask = data_2D > 0
+        count = mask.sum(axis=0)
+        ##  shift by mean of each bead to avoid precision loss of sums of squares
+        shift = np.where(mask, data_2D, 0).sum(axis=0) / np.maximum(count, 1)
+        data = np.where(mask, data_2D - shift, 0)
+        mask = mask.astype(float)
+
+        ##  sliding(overlapping) window
+        sums = []
+        for x in [mask, data, data**2]:
+            cumsum = np.concatenate([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+            sums += [cumsum[window:] - cumsum[:-window]]
+        BM_sliding = factor_p2n * self.__get_window_std(*sums)
+
+        ##  fixing(non-overlapping) window
+        iteration = int(data.shape[0] / window)
+        sums = [x[:iteration * window].reshape(iteration, window, x.shape[1]).sum(axis=1) for x in [mask, data, data**2]]
+        BM_fixing = factor_p2n * self.__get_window_std(*sums)
         return BM_sliding, BM_fixing
 
     ##  cal ratio fo a len=2 list ratio
@@ -370,4 +406,42 @@ class DataToSave:
             chars = "".join([random.choice(string.ascii_letters) for i in range(n)])
             return digits + chars
         else:
-            return random_string
\ No newline at end of file
+            return random_string
+
+##  labels as variable-length string array, h5py 2.10 can not save list of str as attribute
+def _str_array(labels):
+    return np.array([str(x) for x in labels], dtype=h5py.string_dtype())
+
+##  string attribute as list of str, h5py 2.10 may read bytes
+def _decode_labels(labels):
+    return [x.decode() if isinstance(x, bytes) else str(x) for x in labels]
+
+##  path of '*-fitresults.h5' in path_folder saved with title, '' for the file of tracking (not '-reanalyzed')
+def glob_hdf5(path_folder, title=''):
+    paths = sorted(glob(os.path.join(path_folder, f'*{title}-fitresults.h5')))
+    if title == '':
+        paths = [path for path in paths if not path.endswith('-reanalyzed-fitresults.h5')]
+    return paths
+
+##  load DataFrame of fitresults, dictionary of sheets and selection criteria saved by DataToSave.save_to_hdf5
+def load_hdf5(path):
+    with h5py.File(path, 'r') as f:
+        group = f['fitresults']
+        df = pd.DataFrame({column: group[column][()] for column in _decode_labels(group.attrs['columns'])})
+        group = f['sheets']
+        df_dict = dict()
+        for sheet_name in _decode_labels(group.attrs['sheet_names']):
+            dataset = group[sheet_name]
+            if 'index' in dataset.attrs:
+                index = _decode_labels(dataset.attrs['index'])
+            else:
+                index = group[f'{sheet_name}_index'][()]
+            if 'columns' in dataset.attrs:
+                columns = _decode_labels(dataset.attrs['columns'])
+            else:
+                columns = group[f'{sheet_name}_columns'][()]
+            index_name = _decode_labels([dataset.attrs['index_name']])[0]
+            df_dict[sheet_name] = pd.DataFrame(data=dataset[()], columns=columns,
+                                               index=pd.Index(index, name=None if index_name == 'None' else index_name))
+        criteria = f['criteria'][()]
+    return df, df_dict, criteria
@@ -15,7 +15,7 @@ Flowchart
 
 3. Save fitting cideo (optional)
 
-4. Save four files for fitting results
+4. Save fitting results and analyzed sheets to HDF5 file, excel report is optional
 
 """
 
@@ -26,7 +26,7 @@ from TPM.localization import *
 @timing
 def Analyzing(path_folder, read_mode, frame_setread_num, frame_start, criteria_dist,
                  aoi_size, frame_read_forcenter,N_loc, contrast, low, high,
-                 blacklevel, whitelevel, put_text, IC, BM_lower, BM_upper):
+                 blacklevel, whitelevel, put_text, IC, BM_lower, BM_upper, save_excel=False):
     ### Localization
     Glimpse_data, bead_radius, random_string = localization(path_folder, read_mode, frame_setread_num, frame_start, criteria_dist,
                                              aoi_size, frame_read_forcenter, N_loc, contrast, low, high,
@@ -37,8 +37,10 @@ def Analyzing(path_folder, read_mode, frame_setread_num, frame_start, criteria_d
     Save_df = DataToSave(tracking_results, bead_radius, path_folder, frame_start=frame_start,
                          med_fps=Glimpse_data.med_fps, window=20, factor_p2n=10000/180,
                          random_string=random_string, BM_lower=BM_lower, BM_upper=BM_upper)
-    Save_df.save_fitresults_to_csv()
-    Save_df.save_selected_dict_df_to_excel()
+    Save_df.save_to_hdf5()
+    if save_excel:
+        Save_df.save_fitresults_to_csv()
+        Save_df.save_selected_dict_df_to_excel()
     # Save_df.save_removed_dict_df_to_excel()
     # Save_df.Save_four_files()
     return Glimpse_data, Save_df
@@ -50,13 +52,14 @@ frame_start = 0 ## starting frame for tracking
 IC = False
 BM_lower = 30
 BM_upper = 200
+save_excel = False # save csv and excel report besides the HDF5 file
 
 if __name__ == "__main__":
     path_folder = select_folder()
     print(f'run {path_folder}')
     # Glimpse_data, Save_df = Analyzing(path_folder, read_mode, frame_setread_num, frame_start, criteria_dist,
     #                                   aoi_size, frame_read_forcenter,N_loc, contrast, low, high,
-    #                                   blacklevel, whitelevel, put_text, IC,BM_lower, BM_upper)
+    #                                   blacklevel, whitelevel, put_text, IC,BM_lower, BM_upper, save_excel)
 
     ### Localization
     Glimpse_data, bead_radius, random_string = localization(path_folder, read_mode, frame_setread_num, frame_start, criteria_dist,
@@ -68,5 +71,7 @@ if __name__ == "__main__":
     Save_df = DataToSave(tracking_results, bead_radius, path_folder, frame_start=frame_start,
                          med_fps=Glimpse_data.med_fps, window=20, factor_p2n=10000/180,
                          random_string=random_string, BM_lower=BM_lower, BM_upper=BM_upper)
-    Save_df.save_fitresults_to_csv()
-    Save_df.save_selected_dict_df_to_excel()
+    Save_df.save_to_hdf5()
+    if save_excel:
+        Save_df.save_fitresults_to_csv()
+        Save_df.save_selected_dict_df_to_excel()
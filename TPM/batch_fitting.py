@@ -0,0 +1,231 @@
+### import used modules first
+import numpy as np
+import math
+from scipy.ndimage import uniform_filter
+
+
+###  2-D Gaussian with rotation angle for a stack of AOIs, para: (n_aoi, 7), output: (n_aoi, n_pixel)
+def twoD_Gaussian_batch(xy, para):
+    g, J = twoD_Gaussian_jacobian(xy, para, jacobian=False)
+    return g
+
+###  2-D Gaussian and its analytic Jacobian, same parameters as BinaryImage.twoD_Gaussian
+def twoD_Gaussian_jacobian(xy, para, jacobian=True):
+    """Evaluate 2-D Gaussian of all AOIs at once
+    Parameters
+    ----------
+    xy : [x, y], x,y : array, (n_pixel,) or (aoi_size, aoi_size)
+    para : array, (n_aoi, 7)
+        (amplitude, sigma_x, sigma_y, xo, yo, theta_deg, offset) of each AOI
+    jacobian : bool
+        return Jacobian or not
+
+    Returns
+    -------
+    g : array, (n_aoi, n_pixel)
+    J : array, (n_aoi, n_pixel, 7), None if jacobian=False
+    """
+    x = np.ravel(xy[0])[None, :]
+    y = np.ravel(xy[1])[None, :]
+    amplitude, sigma_x, sigma_y, xo, yo, theta_deg, offset = [para[:, [i]] for i in range(7)]
+    theta = theta_deg / 360 * (2 * math.pi)  # in rad
+    cos, sin = np.cos(theta), np.sin(theta)
+    cos2, sin2 = np.cos(2 * theta), np.sin(2 * theta)
+    sx2, sy2 = sigma_x ** 2, sigma_y ** 2
+    a = cos ** 2 / (2 * sx2) + sin ** 2 / (2 * sy2)
+    b = -sin2 / (4 * sx2) + sin2 / (4 * sy2)
+    c = sin ** 2 / (2 * sx2) + cos ** 2 / (2 * sy2)
+    dx = x - xo
+    dy = y - yo
+    E = np.exp(-(a * dx ** 2 + 2 * b * dx * dy + c * dy ** 2))
+    g = offset + amplitude * E
+    if jacobian == False:
+        return g, None
+
+    ##  dg/dQ = -amplitude*E, Q = a*dx^2 + 2b*dx*dy + c*dy^2
+    dg_dQ = -amplitude * E
+    sx3, sy3 = sigma_x ** 3, sigma_y ** 3
+    dQ_dsx = -cos ** 2 / sx3 * dx ** 2 + sin2 / sx3 * dx * dy - sin ** 2 / sx3 * dy ** 2
+    dQ_dsy = -sin ** 2 / sy3 * dx ** 2 - sin2 / sy3 * dx * dy - cos ** 2 / sy3 * dy ** 2
+    dQ_dxo = -2 * a * dx - 2 * b * dy
+    dQ_dyo = -2 * b * dx - 2 * c * dy
+    da = sin2 * (-1 / (2 * sx2) + 1 / (2 * sy2))
+    db = cos2 * (-1 / (2 * sx2) + 1 / (2 * sy2))
+    dQ_dtheta = (da * dx ** 2 + 2 * db * dx * dy - da * dy ** 2) * (2 * math.pi / 360)  # per degree
+
+    J = np.empty(g.shape + (7,))
+    J[:, :, 0] = E
+    J[:, :, 1] = dg_dQ * dQ_dsx
+    J[:, :, 2] = dg_dQ * dQ_dsy
+    J[:, :, 3] = dg_dQ * dQ_dxo
+    J[:, :, 4] = dg_dQ * dQ_dyo
+    J[:, :, 5] = dg_dQ * dQ_dtheta
+    J[:, :, 6] = 1
+    return g, J
+
+###  Levenberg-Marquardt fit for all AOIs simultaneously, parameters are clipped into bounds every step
+def LM_fit_batch(xy, images, p0, bounds, max_iter=100, tolerance=1e-6):
+    """Fit a stack of AOIs with 2-D Gaussian
+    Parameters
+    ----------
+    xy : [x, y], pixel coordinates of an AOI
+    images : array, (n_aoi, aoi_size, aoi_size)
+    p0 : array, (n_aoi, 7)
+        initial guess of each AOI
+    bounds : ((7,), (7,)), lower and upper bounds as curve_fit
+    max_iter : int
+        maximum iterations of each AOI
+    tolerance : float
+        stop when relative decrease of sum of squared residuals < tolerance
+
+    Returns
+    -------
+    popt : array, (n_aoi, 7)
+    ss_res : array, (n_aoi,)
+        sum of squared residuals
+    success : boolean array, (n_aoi,)
+        False if fitting diverges (not finite)
+    """
+    n_aoi = len(images)
+    z = np.reshape(images, (n_aoi, -1)).astype(float)
+    lower = np.array(bounds[0], dtype=float)
+    upper = np.array(bounds[1], dtype=float)
+    eye = np.eye(7)
+
+    p = np.clip(np.array(p0, dtype=float), lower, upper)
+    g, J = twoD_Gaussian_jacobian(xy, p)
+    r = z - g
+    ss_res = np.sum(r ** 2, axis=1)
+    damping = np.full(n_aoi, 1e-3)
+    active = np.isfinite(ss_res)
+    for i in range(max_iter):
+        index = np.flatnonzero(active)
+        if len(index) == 0:
+            break
+        ##  solve (JTJ + damping*diag(JTJ)) * delta = JTr
+        J_i, r_i = J[index], r[index]
+        JTJ = np.einsum('npi,npj->nij', J_i, J_i)
+        JTr = np.einsum('npi,np->ni', J_i, r_i)
+        diag = np.diagonal(JTJ, axis1=1, axis2=2)
+        diag = np.maximum(diag, 1e-9 * np.max(diag, axis=1, keepdims=True) + 1e-12)
+        A = JTJ + damping[index, None, None] * diag[:, :, None] * eye
+        try:
+            delta = np.linalg.solve(A, JTr[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            delta = np.matmul(np.linalg.pinv(A), JTr[:, :, None])[:, :, 0]
+        p_new = np.clip(p[index] + delta, lower, upper)
+        g_new, J_new = twoD_Gaussian_jacobian(xy, p_new)
+        r_new = z[index] - g_new
+        ss_res_new = np.sum(r_new ** 2, axis=1)
+
+        ##  accept steps which decrease residuals, otherwise increase damping
+        better = ss_res_new < ss_res[index]
+        accept = index[better]
+        improvement = (ss_res[accept] - ss_res_new[better]) / np.maximum(ss_res[accept], 1e-12)
+        p[accept], J[accept], r[accept] = p_new[better], J_new[better], r_new[better]
+        ss_res[accept] = ss_res_new[better]
+        damping[accept] = damping[accept] / 10
+        damping[index[~better]] = damping[index[~better]] * 10
+        active[accept[improvement < tolerance]] = False
+        active[index[damping[index] > 1e10]] = False
+
+    success = np.all(np.isfinite(p), axis=1) & np.isfinite(ss_res)
+    return p, ss_res, success
+
+###  background and noise (std from median absolute deviation) of each AOI from border pixels
+def get_background_batch(images):
+    border = np.concatenate([images[:, 0, :], images[:, -1, :], images[:, 1:-1, 0], images[:, 1:-1, -1]], axis=1)
+    background = np.median(border, axis=1)
+    noise = 1.4826 * np.median(np.abs(border - background[:, None]), axis=1)
+    return background, noise
+
+###  background-subtracted centroid and second moments of all AOIs, output: (n_aoi, 7) as Gaussian parameters
+def moment_batch(images, threshold=2):
+    """Estimate 2-D Gaussian parameters from image moments
+    Parameters
+    ----------
+    images : array, (n_aoi, aoi_size, aoi_size)
+    threshold : float
+        pixels lower than background + threshold*noise are ignored
+
+    Returns
+    -------
+    para : array, (n_aoi, 7)
+        (amplitude, sigma_x, sigma_y, xo, yo, theta_deg, offset), nan if AOI is empty
+    """
+    images = np.array(images, dtype=float)
+    index = np.arange(images.shape[1], dtype=float)
+    background, noise = get_background_batch(images)
+    I = images - background[:, None, None]
+    I[I < threshold * noise[:, None, None]] = 0
+    total = np.sum(I, axis=(1, 2))
+    total[total == 0] = np.nan
+    I_x = np.sum(I, axis=1)  # projection to x (columns)
+    I_y = np.sum(I, axis=2)  # projection to y (rows)
+    xo = np.matmul(I_x, index) / total
+    yo = np.matmul(I_y, index) / total
+    Cxx = np.matmul(I_x, index ** 2) / total - xo ** 2
+    Cyy = np.matmul(I_y, index ** 2) / total - yo ** 2
+    Cxy = np.einsum('nij,i,j->n', I, index, index) / total - xo * yo
+    sigma_x, sigma_y, theta_deg = get_sigma_theta(Cxx, Cyy, Cxy)
+    amplitude = np.max(I, axis=(1, 2))
+    return np.column_stack([amplitude, sigma_x, sigma_y, xo, yo, theta_deg, background])
+
+###  convert covariance to (sigma_x, sigma_y, theta_deg) of twoD_Gaussian, theta_deg in [0, 90)
+def get_sigma_theta(Cxx, Cyy, Cxy):
+    phi = 0.5 * np.arctan2(2 * Cxy, Cxx - Cyy)  # angle of major axis
+    half_sum = (Cxx + Cyy) / 2
+    half_diff = np.sqrt(((Cxx - Cyy) / 2) ** 2 + Cxy ** 2)
+    sigma_x = np.sqrt(np.clip(half_sum + half_diff, 0, None))
+    sigma_y = np.sqrt(np.clip(half_sum - half_diff, 0, None))
+    ##  twoD_Gaussian rotates its axes by -theta, rotating 90 degrees is the same as swapping sigma_x and sigma_y
+    theta_deg = np.degrees(-phi) % 180
+    swap = theta_deg >= 90
+    theta_deg[swap] = theta_deg[swap] - 90
+    sigma_x[swap], sigma_y[swap] = sigma_y[swap], sigma_x[swap]
+    return sigma_x, sigma_y, theta_deg
+
+###  radial-symmetry center of all AOIs (Parthasarathy, Nat. Methods 2012), output: x, y in pixel of AOI
+def radial_center_batch(images):
+    images = np.array(images, dtype=float)
+    n_aoi, n_row, n_col = images.shape
+    ##  coordinates of midpoints between pixels, relative to AOI center
+    xm = np.arange(n_col - 1) - (n_col - 2) / 2
+    ym = np.arange(n_row - 1) - (n_row - 2) / 2
+    xm, ym = np.meshgrid(xm, ym)
+    ##  gradients along 45 degree rotated axes, smoothed by 3x3 average
+    dIdu = images[:, :-1, 1:] - images[:, 1:, :-1]
+    dIdv = images[:, :-1, :-1] - images[:, 1:, 1:]
+    dIdu = uniform_filter(dIdu, size=(1, 3, 3), mode='constant')
+    dIdv = uniform_filter(dIdv, size=(1, 3, 3), mode='constant')
+    dImag2 = dIdu ** 2 + dIdv ** 2
+    ##  slope of gradient line through each midpoint
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m = -(dIdv + dIdu) / (dIdu - dIdv)
+    m[np.isnan(m)] = 0
+    is_inf = np.isinf(m)
+    m_max = np.max(np.where(is_inf, 0, m), axis=(1, 2), keepdims=True)
+    m = np.where(is_inf, 10 * m_max, m)
+    b = ym - m * xm
+    ##  weighted by gradient magnitude and distance to centroid
+    sdI2 = np.sum(dImag2, axis=(1, 2), keepdims=True)
+    xcentroid = np.sum(dImag2 * xm, axis=(1, 2), keepdims=True) / sdI2
+    ycentroid = np.sum(dImag2 * ym, axis=(1, 2), keepdims=True) / sdI2
+    w = dImag2 / np.maximum(np.sqrt((xm - xcentroid) ** 2 + (ym - ycentroid) ** 2), 1e-12)
+    ##  least-squares point closest to all lines
+    wm2p1 = w / (m ** 2 + 1)
+    sw = np.sum(wm2p1, axis=(1, 2))
+    smmw = np.sum(m ** 2 * wm2p1, axis=(1, 2))
+    smw = np.sum(m * wm2p1, axis=(1, 2))
+    smbw = np.sum(m * b * wm2p1, axis=(1, 2))
+    sbw = np.sum(b * wm2p1, axis=(1, 2))
+    det = smw ** 2 - smmw * sw
+    xc = (smbw * sw - smw * sbw) / det
+    yc = (smbw * smw - smmw * sbw) / det
+    return xc + (n_col - 1) / 2, yc + (n_row - 1) / 2
+
+###  radial-symmetry center with moment estimates of width and angle, output: (n_aoi, 7)
+def radial_batch(images):
+    para = moment_batch(images)
+    para[:, 3], para[:, 4] = radial_center_batch(images)
+    return para
@@ -1,7 +1,7 @@
 
 
 from TPM.BinaryImage import BinaryImage
-from TPM.DataToSave import DataToSave
+from TPM.DataToSave import DataToSave, load_hdf5, glob_hdf5
 from TPM.localization import select_folder
 import time
 import pandas as pd
@@ -14,15 +14,19 @@ frame_n = 9500
 frame_start = 0
 BM_lower = 0
 BM_upper = 500
+save_excel = False  ## save excel reports besides the HDF5 file
 
 
-def get_analyzed_sheet(path_folder, analyzed_mode, frame_n, BM_lower, BM_upper):
-    path_data = glob(os.path.join(path_folder, '*-fitresults.csv'))[0]
+def get_analyzed_sheet(path_folder, analyzed_mode, frame_n, BM_lower, BM_upper, save_excel=False):
     t1 = time.time()
     Glimpse_data = BinaryImage(path_folder)
     if analyzed_mode == 'all':
         frame_n = Glimpse_data.frames_acquired
-    df = pd.read_csv(path_data)
+    path_h5 = glob_hdf5(path_folder)  ## results of tracking, not '-reanalyzed'
+    if path_h5 != []:  ## prefer HDF5 file, no text parsing
+        df, df_dict, criteria = load_hdf5(path_h5[0])
+    else:
+        df = pd.read_csv(glob(os.path.join(path_folder, '*-fitresults.csv'))[0])
     bead_number = int(max(1 + df['aoi']))
     tracking_results = np.array(df)
     tracking_results = tracking_results[0:bead_number*frame_n, :]
@@ -31,8 +35,10 @@ def get_analyzed_sheet(path_folder, analyzed_mode, frame_n, BM_lower, BM_upper):
                          med_fps=Glimpse_data.med_fps, window=20, factor_p2n=10000/180,
                          BM_lower=BM_lower, BM_upper=BM_upper,
                          )
-    Save_df.save_selected_dict_df_to_excel()
-    Save_df.save_removed_dict_df_to_excel()
+    Save_df.save_to_hdf5(title='-reanalyzed')
+    if save_excel:
+        Save_df.save_selected_dict_df_to_excel()
+        Save_df.save_removed_dict_df_to_excel()
     time_spent = time.time() - t1
     print('spent ' + str(time_spent) + ' s')
     return Save_df
@@ -41,7 +47,7 @@ def get_analyzed_sheet(path_folder, analyzed_mode, frame_n, BM_lower, BM_upper):
 
 if __name__ == "__main__":
     path_folder = select_folder()
-    Save_df = get_analyzed_sheet(path_folder, analyzed_mode, frame_n, BM_lower, BM_upper)
+    Save_df = get_analyzed_sheet(path_folder, analyzed_mode, frame_n, BM_lower, BM_upper, save_excel=save_excel)
     # path_folders = glob(os.path.join(path_folder, '*'))
     # for path_folder in path_folders:
     #     get_analyzed_sheet(path_folder, analyzed_mode, frame_n)
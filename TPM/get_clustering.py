@@ -2,6 +2,7 @@
 ### import used modules first
 
 from TPM.localization import select_folder
+from TPM.DataToSave import load_hdf5, glob_hdf5
 from glob import glob
 import random
 import string
@@ -92,12 +93,35 @@ def get_data_from_excel(path_folder, sheet_names, excel_name, axis):
     return df_attrs_dict
 
 
+##  same as get_data_from_excel, but read sheets saved by DataToSave.save_to_hdf5
+def get_data_from_hdf5(path_folder, sheet_names, h5_title, axis):
+    path_folders = glob(os.path.join(path_folder, '*'))
+    path_data = [glob_hdf5(x, h5_title)[0] for x in path_folders if
+                 glob_hdf5(x, h5_title) != []]
+    df_dict = dict()
+    for i, path in enumerate(path_data):
+        df_sheets = load_hdf5(path)[1]
+        for sheet_name in sheet_names:
+            df = df_sheets[sheet_name].reset_index() ## index as first column, same as read_excel
+            if i==0:
+                df_dict[f'{sheet_name}'] = df
+            else:
+                df_dict[f'{sheet_name}'] = pd.concat([df_dict[f'{sheet_name}'], df], axis=axis)
+    return df_dict
+
+
+use_hdf5 = True # read '*{h5_title}-fitresults.h5', otherwise read excel_name
+h5_title = '' # '' for results of tracking, '-reanalyzed' for results of get_analyzed_sheets
 # excel_name = 'snapshot-fitresults_reshape_analyzed.xlsx'
 excel_name = 'snapshot-fitresults_reshape_analyzed.xlsx'
 #
 path_folder = select_folder()
-df_attrs_dict = get_data_from_excel(path_folder, sheet_names=['med_attrs', 'std_attrs', 'avg_attrs'], excel_name=excel_name, axis=0)
-df_analyzed_dict = get_data_from_excel(path_folder, sheet_names=get_analyzed_sheet_names(), excel_name=excel_name, axis=1)
+if use_hdf5:
+    df_attrs_dict = get_data_from_hdf5(path_folder, sheet_names=['med_attrs', 'std_attrs', 'avg_attrs'], h5_title=h5_title, axis=0)
+    df_analyzed_dict = get_data_from_hdf5(path_folder, sheet_names=get_analyzed_sheet_names(), h5_title=h5_title, axis=1)
+else:
+    df_attrs_dict = get_data_from_excel(path_folder, sheet_names=['med_attrs', 'std_attrs', 'avg_attrs'], excel_name=excel_name, axis=0)
+    df_analyzed_dict = get_data_from_excel(path_folder, sheet_names=get_analyzed_sheet_names(), excel_name=excel_name, axis=1)
 
 
 ##  select statistical attributes for clustering analysis
@@ -148,7 +172,7 @@ model.fit(X)
 ##  assign a cluster to each example
 label = model.predict(X)
 
-beads_name = df_attrs_dict['med_attrs']['Unnamed: 0']
+beads_name = df_attrs_dict['med_attrs'].iloc[:, 0] ## bead names in first column
 # sx_sy = df_select_attrs_dict['med_attrs']['sx_sy']
 sx_sy = df_select_attrs_dict['med_attrs']['BMx_fixing']
 S = [sx_sy[label==i] for i in range(n_components)]
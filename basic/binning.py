@@ -5,40 +5,87 @@ rcParams.update({'font.size': 18})
 import numpy as np
 import matplotlib.pyplot as plt
 
-def binning(data, bin_number, xlabel='value', ylabel='probability density',
-            show=True, density=True, figsize=(10,8), color="silver", fontsize=22):
-    count, edges = np.histogram(data, bin_number)
-    center = []
-    edges = list(edges)
-    for i in range(len(edges) - 1):
-        center += [(edges[i] + edges[i + 1]) / 2]
-    binsize = center[1] - center[0]
-    if density == True:
-        pd = count/sum(count)/binsize
-    else:
-        pd = count
+### numerical histograms, no figure, return pd (count or density), center and edges of bins
+def hist_number(data, bin_number, weights=None, density=True):
+    data = np.asarray(data, dtype=np.float64).ravel()
+    count, edges = np.histogram(data, bin_number, weights=weights)
+    return get_density(count, edges, density), get_center(edges), edges
+
+##  bins of fixed width, edges: start to end+1 by binwidth, same as binning2
+def hist_width(data, binwidth, start=None, end=None, weights=None, density=True):
+    data = np.asarray(data, dtype=np.float64).ravel()
+    if start is None:
+        start = np.min(data)
+    if end is None:
+        end = np.max(data)
+    edges = np.arange(start, end+1, binwidth)
+    n_bins = len(edges) - 1
+    inside = (data >= start) & (data <= edges[-1])
+    index = np.minimum(((data[inside] - start) / binwidth).astype(np.int64), n_bins - 1)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64).ravel()[inside]
+    count = np.bincount(index, weights=weights, minlength=n_bins).astype(np.float64)
+    return get_density(count, edges, density), get_center(edges), edges
+
+##  logarithmic bins from start to end (> 0), e.g. dwell times
+def hist_log(data, bin_number, start=None, end=None, weights=None, density=True):
+    data = np.asarray(data, dtype=np.float64).ravel()
+    if start is None:
+        start = np.min(data[data > 0])
+    if end is None:
+        end = np.max(data)
+    edges = np.geomspace(start, end, bin_number + 1)
+    count, edges = np.histogram(data, edges, weights=weights)
+    return get_density(count, edges, density), np.sqrt(edges[:-1] * edges[1:]), edges
+
+##  histograms of many datasets with the same edges, data: (n_datasets, n_samples), nan is ignored
+##  output pd: (n_datasets, n_bins)
+def hist_batch(data, edges, weights=None, density=True):
+    data = np.atleast_2d(np.asarray(data, dtype=np.float64))
+    edges = np.asarray(edges, dtype=np.float64)
+    n_datasets = data.shape[0]
+    n_bins = len(edges) - 1
+    index = np.searchsorted(edges, data, side='right') - 1
+    index[data == edges[-1]] = n_bins - 1 ## last bin includes right edge
+    inside = (index >= 0) & (index < n_bins) & ~np.isnan(data)
+    index = (index + n_bins * np.arange(n_datasets)[:, None])[inside]
+    if weights is not None:
+        weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), data.shape)[inside]
+    count = np.bincount(index, weights=weights, minlength=n_datasets * n_bins).astype(np.float64)
+    count = count.reshape(n_datasets, n_bins)
+    return get_density(count, edges, density), get_center(edges), edges
+
+def get_center(edges):
+    return (edges[:-1] + edges[1:]) / 2
+
+##  count / total count / bin width of each bin, along last axis
+def get_density(count, edges, density=True):
+    if density == False:
+        return count
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return count / np.sum(count, axis=-1, keepdims=True) / np.diff(edges)
+
+##  bar plot of a histogram from hist_* functions
+def plot_hist(pd, center, edges, xlabel='value', ylabel='probability density',
+              show=True, figsize=(10,8), color="silver", fontsize=22):
     fig, ax = plt.subplots(figsize=figsize)
-    ax.bar(center, pd, width=binsize, color=color, edgecolor="white")
+    ax.bar(center, pd, width=np.diff(edges), color=color, edgecolor="white")
     ax.set_xlabel(f'{xlabel}', fontsize=fontsize)
     ax.set_ylabel(f'{ylabel}', fontsize=fontsize)
     if show==False:
         plt.close(fig)
+    return fig, ax
+
+def binning(data, bin_number, xlabel='value', ylabel='probability density',
+            show=True, density=True, figsize=(10,8), color="silver", fontsize=22):
+    pd, center, edges = hist_number(data, bin_number, density=density)
+    fig, ax = plot_hist(pd, center, edges, xlabel=xlabel, ylabel=ylabel, show=show,
+                        figsize=figsize, color=color, fontsize=fontsize)
     return pd, center, fig, ax
 
 def binning2(data, binwidth, start=None, end=None, xlabel='value', ylabel='probability density', show=True, density=True):
-    if start==None:
-        start = min(data)
-    if end == None:
-        end = max(data)
-    bin_edge = np.arange(start, end+1, binwidth)
-    center = np.arange(start+binwidth/2, end-binwidth/2+1, binwidth)
-    fig, ax = plt.subplots(figsize=(10, 8))
-    pd, edges, patches = plt.hist(data, bins=bin_edge, density=density)
-    ax.bar(center, pd, width=binwidth, color="silver", edgecolor="white")
-    ax.set_xlabel(f'{xlabel}', fontsize=22)
-    ax.set_ylabel(f'{ylabel}', fontsize=22)
-    if show==False:
-        plt.close(fig)
+    pd, center, edges = hist_width(data, binwidth, start=start, end=end, density=density)
+    fig, ax = plot_hist(pd, center, edges, xlabel=xlabel, ylabel=ylabel, show=show)
     return pd, center, fig, ax
 
 def scatter_hist(x, y, ax, ax_histx, ax_histy):
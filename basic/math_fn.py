@@ -37,42 +37,39 @@ def oneD_gaussian(x, args):
     """
     x, f, xm, s = to_1darray(x, args[0], args[1], args[2])
     x = x.ravel()
-    y = np.empty((f.size, x.size))
-    for i in range(f.size):
-        y[i, :] = f[i] * gauss(x, xm[i], s[i])
+    y = f[:, None] * gauss(x[None, :], xm[:, None], s[:, None])
     return y
 
 def ln_oneD_gaussian(x, args):
     x, f, xm, s = to_1darray(x, args[0], args[1], args[2])
     x = x.ravel()
-    lny = np.empty((f.size, x.size))
-    for i in range(f.size):
-        lny[i, :] = np.log(f[i]) + ln_gauss(x, xm[i], s[i])
+    lny = np.log(f)[:, None] + ln_gauss(x[None, :], xm[:, None], s[:, None])
     return lny
 
 def exp_survival(t, args):
     t, f, tau = to_1darray(t, args[0], args[1])
     t = t.ravel()
-    y = np.empty((f.size, t.size))
-    for i in range(f.size):
-        y[i, :] = f[i] * np.exp(-t/tau[i])
+    y = f[:, None] * np.exp(-t[None, :] / tau[:, None])
     return y
 
 ##  args: list
 def exp_pdf(t, args):
     t, f, tau = to_1darray(t, args[0], args[1])
     t = t.ravel()
-    y = np.empty((f.size, t.size))
-    for i in range(f.size):
-        y[i, :] = f[i] / tau[i] * np.exp(-t / tau[i])
+    y = (f / tau)[:, None] * np.exp(-t[None, :] / tau[:, None])
     return y
 
 def ln_exp_pdf(t, args):
     t, f, tau = to_1darray(t, args[0], args[1])
     t = t.ravel()
-    lny = np.empty((f.size, t.size))
-    for i in range(f.size):
-        lny[i, :] = np.log(f[i]) - np.log(tau[i]) - t/tau[i]
+    lny = (np.log(f) - np.log(tau))[:, None] - t[None, :] / tau[:, None]
+    return lny
+
+##  f * pdf for observed t, f * survival for censored t, censored: (n,) bool
+def ln_exp_pdf_censored(t, args, censored):
+    t, f, tau = to_1darray(t, args[0], args[1])
+    lny = ln_exp_pdf(t, [f, tau])
+    lny += np.log(tau)[:, None] * np.asarray(censored, dtype=lny.dtype).ravel()[None, :] ## ln(survival) = ln(pdf) + ln(tau)
     return lny
 
 def gau_exp_pdf(data, args):
@@ -80,9 +77,7 @@ def gau_exp_pdf(data, args):
     x, t, f, xm, s, tau = to_1darray(data[:, 0], data[:, 1], args[0], args[1], args[2], args[3])
     x = x.ravel()
     t = t.ravel()
-    y = np.empty((f.size, x.size))
-    for i in range(f.size):
-        y[i, :] = f[i] * gauss(x, xm[i], s[i]) * exp_dist(t, tau[i])
+    y = f[:, None] * gauss(x[None, :], xm[:, None], s[:, None]) * exp_dist(t[None, :], tau[:, None])
     return y
 
 def ln_gau_exp_pdf(data, args):
@@ -90,9 +85,7 @@ def ln_gau_exp_pdf(data, args):
     x, t, f, xm, s, tau = to_1darray(data[:, 0], data[:, 1], args[0], args[1], args[2], args[3])
     x = x.ravel()
     t = t.ravel()
-    lny = np.empty((f.size, x.size))
-    for i in range(f.size):
-        lny[i, :] = np.log(f[i]) + ln_gauss(x, xm[i], s[i]) + ln_exp_dist(t, tau[i])
+    lny = np.log(f)[:, None] + ln_gauss(x[None, :], xm[:, None], s[:, None]) + ln_exp_dist(t[None, :], tau[:, None])
     return lny
 
 def exp_gauss_2d(x, t, f, m, sigma, tau):